@@ -0,0 +1,112 @@
+from codec import CodecRecetas
+
+# Capa de acceso a Redis para las recetas: agrupa las lecturas y escrituras en
+# pipelines para que el número de viajes a Redis no dependa de cuántas recetas haya.
+# Las recetas se guardan en binario (ver codec.py): las funciones que leen o escriben el campo
+# 'receta' necesitan un cliente de Redis sin decode_responses.
+
+CODEC = CodecRecetas()
+
+# Conjunto ordenado con los IDs de las recetas (puntaje = ID, es decir, orden de creación)
+CLAVE_INDICE = 'recetas'
+# Marca de que ya se indexaron las recetas guardadas antes de que existiera el índice
+CLAVE_INDICE_COMPLETO = 'recetas:indexado'
+# Versión del conjunto de recetas: aumenta con cada alta, modificación o baja. La aplicación de
+# Jinja2 la usa en la clave de las páginas que guarda renderizadas, así que toda escritura la aumenta
+CLAVE_VERSION = 'recetas:version'
+LOTE_INDEXADO = 1000
+
+
+def clave_receta(receta_id):
+    return f"receta:{receta_id}"
+
+
+def cargar_recetas(redis_client, ids, codec=CODEC):
+    """Carga varias recetas en un solo pipeline y devuelve una lista de (id, dict) de las que existen.
+
+    El dict incluye 'version', que aumenta con cada modificación (0 si nunca se modificó).
+    """
+    ids = list(ids)
+    pipe = redis_client.pipeline(transaction=False)
+    for receta_id in ids:
+        pipe.hmget(clave_receta(receta_id), 'receta', 'version')
+    recetas = []
+    for receta_id, (valor, version) in zip(ids, pipe.execute()):
+        if valor:
+            recetas.append((receta_id, dict(codec.decodificar(valor), version=int(version or 0))))
+    return recetas
+
+
+def guardar_recetas(redis_client, recetas, codec=CODEC):
+    """Guarda varias recetas (dicts) reservando sus IDs con un solo INCRBY y devuelve los IDs asignados."""
+    recetas = list(recetas)
+    if not recetas:
+        return []
+    ultimo_id = redis_client.incrby('receta_id', len(recetas))
+    ids = list(range(ultimo_id - len(recetas) + 1, ultimo_id + 1))
+    # MULTI/EXEC: la receta y su entrada en el índice se guardan juntas
+    pipe = redis_client.pipeline()
+    for receta_id, receta in zip(ids, recetas):
+        pipe.hset(clave_receta(receta_id), mapping={'receta': codec.codificar(receta)})
+    pipe.zadd(CLAVE_INDICE, {receta_id: receta_id for receta_id in ids})
+    pipe.incr(CLAVE_VERSION)
+    pipe.execute()
+    return ids
+
+
+def actualizar_receta_guardada(redis_client, receta_id, receta, version=None, codec=CODEC):
+    """Reescribe una receta (dict) en su misma clave con WATCH/MULTI, sin reservar un ID nuevo.
+
+    Si se indica 'version', solo se escribe si la receta sigue en esa versión (nadie la modificó
+    desde que se leyó). Devuelve la nueva versión, False si la versión no coincide o None si la
+    receta no existe.
+    """
+    clave = clave_receta(receta_id)
+
+    def actualizar(pipe):
+        existe, version_actual = pipe.exists(clave), int(pipe.hget(clave, 'version') or 0)
+        if not existe:
+            return None
+        if version is not None and version != version_actual:
+            return False
+        pipe.multi()
+        pipe.hset(clave, mapping={'receta': codec.codificar(receta), 'version': version_actual + 1})
+        pipe.incr(CLAVE_VERSION)
+        return version_actual + 1
+
+    # Si otra escritura toca la clave entre WATCH y EXEC, redis-py reintenta y se vuelve a comparar la versión
+    return redis_client.transaction(actualizar, clave, value_from_callable=True)
+
+
+def borrar_receta(redis_client, receta_id):
+    """Elimina una receta y su entrada en el índice; devuelve False si no existía."""
+    pipe = redis_client.pipeline()
+    pipe.delete(clave_receta(receta_id))
+    pipe.zrem(CLAVE_INDICE, receta_id)
+    pipe.incr(CLAVE_VERSION)
+    eliminadas, _, _ = pipe.execute()
+    return eliminadas > 0
+
+
+def indexar_recetas(redis_client):
+    """Agrega al índice las recetas guardadas antes de que existiera, recorriendo las claves con SCAN, y deja la marca."""
+    pipe = redis_client.pipeline(transaction=False)
+    for clave in redis_client.scan_iter(match=clave_receta('*'), count=LOTE_INDEXADO):
+        receta_id = int(clave.split(":")[-1])
+        pipe.zadd(CLAVE_INDICE, {receta_id: receta_id})
+        if len(pipe) >= LOTE_INDEXADO:
+            pipe.execute()
+    pipe.set(CLAVE_INDICE_COMPLETO, 1)
+    pipe.execute()
+
+
+def pagina_ids_recetas(redis_client, despues_de=0, limite=20):
+    """Devuelve hasta 'limite' IDs de recetas posteriores a 'despues_de' y el cursor de la página siguiente (o None).
+
+    ZRANGEBYSCORE con LIMIT cuesta O(log N + limite): el tiempo de cada página no depende de
+    cuántas recetas haya en total.
+    """
+    ids = [int(receta_id) for receta_id in
+           redis_client.zrangebyscore(CLAVE_INDICE, f"({despues_de}", '+inf', start=0, num=limite + 1)]
+    siguiente = ids[limite - 1] if len(ids) > limite else None
+    return ids[:limite], siguiente
@@ -0,0 +1,82 @@
+from almacen import CLAVE_INDICE, CLAVE_INDICE_COMPLETO, CLAVE_VERSION, CODEC, LOTE_INDEXADO, clave_receta
+
+# Las mismas operaciones de almacen.py para un cliente de redis.asyncio (las usa main_async.py):
+# mismas claves, mismo formato y mismos pipelines, pero cada viaje a Redis libera el event loop
+# para atender otras solicitudes mientras se espera la respuesta.
+
+
+async def cargar_recetas(redis_client, ids, codec=CODEC):
+    """Carga varias recetas en un solo pipeline y devuelve una lista de (id, dict) de las que existen."""
+    ids = list(ids)
+    pipe = redis_client.pipeline(transaction=False)
+    for receta_id in ids:
+        pipe.hmget(clave_receta(receta_id), 'receta', 'version')
+    recetas = []
+    for receta_id, (valor, version) in zip(ids, await pipe.execute()):
+        if valor:
+            recetas.append((receta_id, dict(codec.decodificar(valor), version=int(version or 0))))
+    return recetas
+
+
+async def guardar_recetas(redis_client, recetas, codec=CODEC):
+    """Guarda varias recetas (dicts) reservando sus IDs con un solo INCRBY y devuelve los IDs asignados."""
+    recetas = list(recetas)
+    if not recetas:
+        return []
+    ultimo_id = await redis_client.incrby('receta_id', len(recetas))
+    ids = list(range(ultimo_id - len(recetas) + 1, ultimo_id + 1))
+    pipe = redis_client.pipeline()
+    for receta_id, receta in zip(ids, recetas):
+        pipe.hset(clave_receta(receta_id), mapping={'receta': codec.codificar(receta)})
+    pipe.zadd(CLAVE_INDICE, {receta_id: receta_id for receta_id in ids})
+    pipe.incr(CLAVE_VERSION)
+    await pipe.execute()
+    return ids
+
+
+async def actualizar_receta_guardada(redis_client, receta_id, receta, version=None, codec=CODEC):
+    """Reescribe una receta (dict) en su misma clave con WATCH/MULTI; ver almacen.actualizar_receta_guardada."""
+    clave = clave_receta(receta_id)
+
+    async def actualizar(pipe):
+        existe, version_actual = await pipe.exists(clave), int(await pipe.hget(clave, 'version') or 0)
+        if not existe:
+            return None
+        if version is not None and version != version_actual:
+            return False
+        pipe.multi()
+        pipe.hset(clave, mapping={'receta': codec.codificar(receta), 'version': version_actual + 1})
+        pipe.incr(CLAVE_VERSION)
+        return version_actual + 1
+
+    return await redis_client.transaction(actualizar, clave, value_from_callable=True)
+
+
+async def borrar_receta(redis_client, receta_id):
+    """Elimina una receta y su entrada en el índice; devuelve False si no existía."""
+    pipe = redis_client.pipeline()
+    pipe.delete(clave_receta(receta_id))
+    pipe.zrem(CLAVE_INDICE, receta_id)
+    pipe.incr(CLAVE_VERSION)
+    eliminadas, _, _ = await pipe.execute()
+    return eliminadas > 0
+
+
+async def indexar_recetas(redis_client):
+    """Agrega al índice las recetas guardadas antes de que existiera y deja la marca."""
+    pipe = redis_client.pipeline(transaction=False)
+    async for clave in redis_client.scan_iter(match=clave_receta('*'), count=LOTE_INDEXADO):
+        receta_id = int(clave.split(":")[-1])
+        pipe.zadd(CLAVE_INDICE, {receta_id: receta_id})
+        if len(pipe) >= LOTE_INDEXADO:
+            await pipe.execute()
+    pipe.set(CLAVE_INDICE_COMPLETO, 1)
+    await pipe.execute()
+
+
+async def pagina_ids_recetas(redis_client, despues_de=0, limite=20):
+    """Devuelve hasta 'limite' IDs de recetas posteriores a 'despues_de' y el cursor de la página siguiente (o None)."""
+    ids = [int(receta_id) for receta_id in
+           await redis_client.zrangebyscore(CLAVE_INDICE, f"({despues_de}", '+inf', start=0, num=limite + 1)]
+    siguiente = ids[limite - 1] if len(ids) > limite else None
+    return ids[:limite], siguiente
@@ -0,0 +1,110 @@
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+import redis
+
+from codec import FORMATO_JSON, FORMATO_MSGPACK, FORMATO_STRUCT, CodecRecetas, msgpack
+from main import Receta
+
+# Compara el formato anterior (JSON dentro del hash, json.dumps(receta.__dict__) / Receta(**dict))
+# con los formatos de codec.py: tiempo de codificar y decodificar, bytes por receta y, si se indica
+# un servidor con --redis, memoria usada por Redis cada 100.000 recetas. También compara la
+# memoria de 100.000 objetos Receta con __dict__ y con __slots__.
+# Uso: python benchmark_codec.py [--recetas 100000] [--redis redis://localhost:6379/15]
+
+PREFIJO = 'benchmark_codec'
+INGREDIENTES = ['harina', 'huevos', 'leche', 'azúcar', 'manteca', 'sal', 'levadura', 'cebolla', 'tomate', 'ajo']
+
+
+class RecetaConDict:
+    """Receta como era antes de __slots__."""
+
+    def __init__(self, nombre, ingredientes, pasos):
+        self.nombre = nombre
+        self.ingredientes = ingredientes
+        self.pasos = pasos
+
+
+def recetas_de_prueba(cantidad):
+    azar = random.Random(0)
+    for i in range(cantidad):
+        pasos = ', '.join(f"paso {j}: mezclar y cocinar a fuego {azar.choice(['bajo', 'medio', 'alto'])}"
+                          for j in range(azar.choice([2, 4, 8, 16])))
+        yield {'nombre': f"Receta número {i}", 'ingredientes': ', '.join(azar.sample(INGREDIENTES, 4)), 'pasos': pasos}
+
+
+def formatos():
+    yield 'json (anterior)', None
+    yield 'json (codec)', CodecRecetas(FORMATO_JSON)
+    if msgpack is not None:
+        yield 'msgpack', CodecRecetas(FORMATO_MSGPACK, comprimir_desde=None)
+        yield 'msgpack + zlib', CodecRecetas(FORMATO_MSGPACK)
+    yield 'struct', CodecRecetas(FORMATO_STRUCT, comprimir_desde=None)
+    yield 'struct + zlib', CodecRecetas(FORMATO_STRUCT)
+
+
+def medir_memoria_redis(cliente, valores):
+    """Guarda los valores como lo hace la aplicación (un hash por receta) y devuelve los bytes que sumó Redis."""
+    antes = cliente.info('memory')['used_memory']
+    pipe = cliente.pipeline(transaction=False)
+    for i, valor in enumerate(valores):
+        pipe.hset(f"{PREFIJO}:{i}", 'receta', valor)
+        if len(pipe) >= 1000:
+            pipe.execute()
+    pipe.execute()
+    despues = cliente.info('memory')['used_memory']
+    for inicio in range(0, len(valores), 1000):
+        cliente.delete(*(f"{PREFIJO}:{i}" for i in range(inicio, min(inicio + 1000, len(valores)))))
+    return despues - antes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los formatos de las recetas guardadas en Redis.")
+    parser.add_argument("--recetas", type=int, default=100000)
+    parser.add_argument("--redis", default=None, help="URL de un Redis de prueba para medir la memoria usada")
+    args = parser.parse_args()
+
+    recetas = list(recetas_de_prueba(args.recetas))
+    cliente = redis.Redis.from_url(args.redis) if args.redis else None
+    escala = 100000 / args.recetas
+
+    print(f"{args.recetas} recetas (valores por cada 100.000)")
+    print(f"{'Formato':<18}{'codificar s':>13}{'decodificar s':>15}{'bytes/receta':>14}{'MB en Redis':>13}")
+    for nombre, codec in formatos():
+        objetos = [RecetaConDict(**datos) for datos in recetas]
+        inicio = time.perf_counter()
+        if codec is None:
+            valores = [json.dumps(receta.__dict__) for receta in objetos]
+        else:
+            valores = [codec.codificar({'nombre': r.nombre, 'ingredientes': r.ingredientes, 'pasos': r.pasos})
+                       for r in objetos]
+        codificar = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        if codec is None:
+            decodificadas = [RecetaConDict(**json.loads(valor)) for valor in valores]
+        else:
+            decodificadas = [Receta(**codec.decodificar(valor)) for valor in valores]
+        decodificar = time.perf_counter() - inicio
+        assert decodificadas[-1].pasos == recetas[-1]['pasos']
+
+        tamano = sum(len(valor.encode('utf-8') if isinstance(valor, str) else valor) for valor in valores)
+        memoria = f"{medir_memoria_redis(cliente, valores) * escala / 2 ** 20:>13.1f}" if cliente else f"{'-':>13}"
+        print(f"{nombre:<18}{codificar * escala:>13.3f}{decodificar * escala:>15.3f}"
+              f"{tamano / len(valores):>14.1f}{memoria}")
+
+    print(f"\n{'Objetos en memoria':<18}{'MB':>13}")
+    for nombre, clase in (("con __dict__", RecetaConDict), ("con __slots__", Receta)):
+        tracemalloc.start()
+        objetos = [clase(**datos) for datos in recetas]
+        usada = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del objetos
+        print(f"{nombre:<18}{usada * escala / 2 ** 20:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
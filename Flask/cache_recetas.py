@@ -0,0 +1,122 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Caché en memoria (por proceso) de recetas ya decodificadas, para no ir a Redis ni ejecutar
+# json.loads en cada página. Cada worker de Gunicorn tiene la suya; para que todas se mantengan
+# coherentes, quien modifica o elimina una receta publica su ID en un canal de Redis y cada worker
+# la descarta al recibirlo. Si se pierde un mensaje (p. ej. se cae la conexión), el TTL limita
+# cuánto tiempo puede verse una receta desactualizada.
+
+CANAL_INVALIDACION = 'recetas:invalidacion'
+TODAS = '*'
+
+
+class CacheRecetas:
+    """Caché LRU de recetas con tamaño máximo y TTL, con contadores de aciertos, fallos y desalojos."""
+
+    def __init__(self, capacidad=1000, ttl=60):
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self._recetas = OrderedDict()  # id -> (vencimiento, receta), de la menos a la más usada
+        # Aumenta con cada invalidación: si cambia entre que se lee una receta de Redis y se guarda
+        # acá, lo leído puede estar desactualizado y no se guarda. Un solo contador (y no uno por
+        # receta) para que no crezca con cada ID invalidado
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+        self._lock_suscripcion = threading.Lock()
+        self.contadores = {'aciertos': 0, 'fallos': 0, 'desalojos': 0, 'vencidas': 0, 'invalidaciones': 0,
+                           'descartadas': 0}
+
+    def obtener(self, receta_id):
+        """Devuelve una copia de la receta guardada o None si no está o ya venció."""
+        with self._lock:
+            guardada = self._recetas.get(receta_id)
+            if guardada is None:
+                self.contadores['fallos'] += 1
+                return None
+            vencimiento, receta = guardada
+            if vencimiento <= time.monotonic():
+                del self._recetas[receta_id]
+                self.contadores['vencidas'] += 1
+                self.contadores['fallos'] += 1
+                return None
+            self._recetas.move_to_end(receta_id)
+            self.contadores['aciertos'] += 1
+        # Copia: quien la recibe puede modificarla (p. ej. actualizar_receta) sin tocar la caché
+        return copy.copy(receta)
+
+    def marca(self):
+        """Devuelve la marca de invalidaciones a pasar a guardar(); se toma antes de leer la receta de Redis."""
+        with self._lock:
+            return self._generacion
+
+    def guardar(self, receta_id, receta, marca=None):
+        """Guarda una receta y desaloja las menos usadas si se supera la capacidad.
+
+        Si se indica la 'marca' tomada antes de leerla y desde entonces hubo alguna invalidación, no
+        se guarda (pudo ser de esta receta y llegar después de la lectura, y lo leído ya no vale).
+        """
+        with self._lock:
+            if marca is not None and marca != self._generacion:
+                self.contadores['descartadas'] += 1
+                return
+            self._recetas[receta_id] = (time.monotonic() + self.ttl, copy.copy(receta))
+            self._recetas.move_to_end(receta_id)
+            while len(self._recetas) > self.capacidad:
+                self._recetas.popitem(last=False)
+                self.contadores['desalojos'] += 1
+
+    def invalidar(self, receta_id=TODAS):
+        """Descarta una receta (o todas con TODAS) de esta caché."""
+        with self._lock:
+            if receta_id == TODAS:
+                self._recetas.clear()
+            else:
+                self._recetas.pop(receta_id, None)
+            self._generacion += 1
+            self.contadores['invalidaciones'] += 1
+
+    def estadisticas(self):
+        """Devuelve los contadores, el tamaño actual y la tasa de aciertos."""
+        with self._lock:
+            estadisticas = dict(self.contadores, tamano=len(self._recetas), capacidad=self.capacidad, ttl=self.ttl)
+        consultas = estadisticas['aciertos'] + estadisticas['fallos']
+        estadisticas['tasa_aciertos'] = estadisticas['aciertos'] / consultas if consultas else 0.0
+        return estadisticas
+
+    def escuchar_invalidaciones(self, redis_client, canal=CANAL_INVALIDACION):
+        """Se suscribe (una vez por proceso) al canal de invalidaciones en un hilo en segundo plano."""
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._lock_suscripcion:
+            if self._hilo is not None and self._pid == os.getpid():
+                return
+            # Proceso nuevo (p. ej. un worker creado con fork) o hilo caído: lo guardado puede estar desactualizado
+            self.invalidar(TODAS)
+            self._pid = os.getpid()
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{canal: self._recibir_invalidacion})
+            self._hilo = pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=self._error_suscripcion)
+
+    def _recibir_invalidacion(self, mensaje):
+        receta_id = mensaje['data']
+        if isinstance(receta_id, bytes):
+            receta_id = receta_id.decode()
+        self.invalidar(TODAS if receta_id == TODAS else int(receta_id))
+
+    def _error_suscripcion(self, error, pubsub, hilo):
+        # Sin suscripción no llegan invalidaciones: se vacía la caché y se vuelve a suscribir
+        # en la próxima lectura
+        hilo.stop()
+        self._hilo = None
+        self.invalidar(TODAS)
+
+
+def publicar_invalidacion(redis_client, receta_id, canal=CANAL_INVALIDACION):
+    """Avisa a todos los procesos que la receta cambió o se eliminó."""
+    redis_client.publish(canal, receta_id)
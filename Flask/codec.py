@@ -0,0 +1,108 @@
+import json
+import struct
+import zlib
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional: sin él se usa el formato struct
+    msgpack = None
+
+# Formatos binarios de las recetas guardadas en Redis. El primer byte indica el formato (versión)
+# con el que se codificó el resto, así los datos viejos se siguen leyendo cuando cambia el formato
+# por defecto y se migran solos la próxima vez que se guardan. Las recetas guardadas como JSON antes
+# de que existiera este módulo empiezan con '{' y se leen igual.
+#   0x01 + msgpack de [nombre, ingredientes, pasos]
+#   0x02 + struct '<III' con los largos en bytes + los tres textos en UTF-8 seguidos
+# Si al byte de formato se le suma COMPRIMIDO, el resto está comprimido con zlib (solo se comprime
+# cuando la receta ocupa al menos 'comprimir_desde' bytes y comprimida ocupa menos).
+#
+# Este archivo es una copia de Jinja2/codec.py: las dos aplicaciones leen y escriben las mismas claves de
+# Redis, así que cualquier cambio en los formatos (bytes de versión, COMPRIMIDO, CAMPOS, cabecera)
+# tiene que hacerse en los dos o una no podrá leer lo que guarda la otra.
+
+FORMATO_JSON = 'json'
+FORMATO_MSGPACK = 'msgpack'
+FORMATO_STRUCT = 'struct'
+
+VERSION_MSGPACK = 0x01
+VERSION_STRUCT = 0x02
+COMPRIMIDO = 0x80
+INICIO_JSON = ord('{')
+
+CAMPOS = ('nombre', 'ingredientes', 'pasos')
+CABECERA_STRUCT = struct.Struct('<III')
+UMBRAL_COMPRESION = 256
+NIVEL_COMPRESION = 6
+
+
+def _codificar_msgpack(campos):
+    return msgpack.packb(campos, use_bin_type=True)
+
+
+def _decodificar_msgpack(datos):
+    return msgpack.unpackb(datos, raw=False)
+
+
+def _codificar_struct(campos):
+    textos = [campo.encode('utf-8') for campo in campos]
+    return CABECERA_STRUCT.pack(*map(len, textos)) + b''.join(textos)
+
+
+def _decodificar_struct(datos):
+    largos = CABECERA_STRUCT.unpack_from(datos)
+    campos = []
+    inicio = CABECERA_STRUCT.size
+    for largo in largos:
+        campos.append(datos[inicio:inicio + largo].decode('utf-8'))
+        inicio += largo
+    return campos
+
+
+CODIFICADORES = {
+    FORMATO_MSGPACK: (VERSION_MSGPACK, _codificar_msgpack),
+    FORMATO_STRUCT: (VERSION_STRUCT, _codificar_struct),
+}
+DECODIFICADORES = {
+    VERSION_MSGPACK: _decodificar_msgpack,
+    VERSION_STRUCT: _decodificar_struct,
+}
+
+
+class CodecRecetas:
+    """Convierte los datos de una receta (dict con nombre, ingredientes y pasos) a bytes y de vuelta."""
+
+    def __init__(self, formato=None, comprimir_desde=UMBRAL_COMPRESION):
+        if formato is None:
+            formato = FORMATO_MSGPACK if msgpack is not None else FORMATO_STRUCT
+        if formato == FORMATO_MSGPACK and msgpack is None:
+            raise ValueError("El formato 'msgpack' necesita el paquete msgpack instalado")
+        if formato not in CODIFICADORES and formato != FORMATO_JSON:
+            raise ValueError(f"Formato desconocido: '{formato}'")
+        self.formato = formato
+        self.comprimir_desde = comprimir_desde
+
+    def codificar(self, datos):
+        """Devuelve los bytes a guardar en Redis para los datos de una receta."""
+        if self.formato == FORMATO_JSON:
+            return json.dumps(datos).encode('utf-8')
+        version, codificar = CODIFICADORES[self.formato]
+        cuerpo = codificar([datos[campo] for campo in CAMPOS])
+        if self.comprimir_desde is not None and len(cuerpo) >= self.comprimir_desde:
+            comprimido = zlib.compress(cuerpo, NIVEL_COMPRESION)
+            if len(comprimido) < len(cuerpo):
+                return bytes([version | COMPRIMIDO]) + comprimido
+        return bytes([version]) + cuerpo
+
+    def decodificar(self, valor):
+        """Devuelve el dict de una receta guardada en cualquiera de los formatos conocidos."""
+        if isinstance(valor, str):
+            valor = valor.encode('utf-8')
+        if valor[0] == INICIO_JSON:
+            return json.loads(valor)
+        version = valor[0] & ~COMPRIMIDO
+        if version not in DECODIFICADORES:
+            raise ValueError(f"Versión de receta desconocida: {valor[0]:#04x}")
+        cuerpo = valor[1:]
+        if valor[0] & COMPRIMIDO:
+            cuerpo = zlib.decompress(cuerpo)
+        return dict(zip(CAMPOS, DECODIFICADORES[version](cuerpo)))
@@ -1,6 +1,8 @@
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, jsonify, render_template, request, redirect, url_for
 import redis
-import json
+from almacen import (CLAVE_INDICE_COMPLETO, actualizar_receta_guardada, borrar_receta, cargar_recetas,
+                     guardar_recetas, indexar_recetas, pagina_ids_recetas)
+from cache_recetas import CacheRecetas, publicar_invalidacion
 
 my_app = Flask(__name__)
 
@@ -8,24 +10,79 @@ REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 
 redis_client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+# Las recetas se guardan en binario (codec.py), así que se leen y escriben con un cliente sin decode_responses
+redis_binario = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, db=0)
+
+# Recetas decodificadas en memoria de este proceso: hasta 1000, durante 60 segundos como máximo
+cache_recetas = CacheRecetas(capacidad=1000, ttl=60)
+
+# Recetas por página en el listado
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+
+indice_verificado = False
 
 class Receta:
-    def __init__(self, nombre, ingredientes, pasos):
+    # Sin __dict__ por instancia: cada receta en memoria (p. ej. en la caché) ocupa menos
+    __slots__ = ('nombre', 'ingredientes', 'pasos', 'id', 'version')
+
+    def __init__(self, nombre, ingredientes, pasos, id=None, version=0):
         self.nombre = nombre
         self.ingredientes = ingredientes
         self.pasos = pasos
+        self.id = id
+        self.version = version
+
+    def datos(self):
+        """Campos que se guardan en Redis (el ID va en la clave y la versión en su propio campo)."""
+        return {'nombre': self.nombre, 'ingredientes': self.ingredientes, 'pasos': self.pasos}
+
+def cargar_recetas_cacheadas(ids):
+    """Devuelve las recetas que existen, en el orden de 'ids'; solo las que no están en la caché se piden a Redis."""
+    cache_recetas.escuchar_invalidaciones(redis_client)
+    recetas = {}
+    faltantes = []
+    # Marca tomada antes de leer de Redis: si hay una invalidación mientras tanto, lo leído no se guarda
+    marca = cache_recetas.marca()
+    for receta_id in ids:
+        receta = cache_recetas.obtener(receta_id)
+        if receta is None:
+            faltantes.append(receta_id)
+        else:
+            recetas[receta_id] = receta
+    for receta_id, datos in cargar_recetas(redis_binario, faltantes):
+        recetas[receta_id] = Receta(id=receta_id, **datos)
+        cache_recetas.guardar(receta_id, recetas[receta_id], marca)
+    return [recetas[receta_id] for receta_id in ids if receta_id in recetas]
+
+def invalidar_receta(receta_id):
+    cache_recetas.invalidar(receta_id)
+    publicar_invalidacion(redis_client, receta_id)
+
+def asegurar_indice():
+    """Crea el índice de recetas si no existe (recetas guardadas antes de que existiera); una vez por proceso."""
+    global indice_verificado
+    if not indice_verificado:
+        if not redis_client.exists(CLAVE_INDICE_COMPLETO):
+            indexar_recetas(redis_client)
+        indice_verificado = True
 
 def cargar_receta(receta_id):
-    receta_json = redis_client.hget(f"receta:{receta_id}", 'receta')
-    if receta_json:
-        receta_dict = json.loads(receta_json)
-        return Receta(**receta_dict)
+    recetas = cargar_recetas_cacheadas([receta_id])
+    if recetas:
+        return recetas[0]
     return None
 
 def guardar_receta(receta):
-    receta_id = redis_client.incr('receta_id')
-    receta_json = json.dumps(receta.__dict__)
-    redis_client.hset(f"receta:{receta_id}", 'receta', receta_json)
+    receta.id = guardar_recetas(redis_binario, [receta.datos()])[0]
+    invalidar_receta(receta.id)
+    return receta.id
+
+def reemplazar_receta(receta, version=None):
+    """Guarda los cambios de una receta en su misma clave; ver actualizar_receta_guardada."""
+    resultado = actualizar_receta_guardada(redis_binario, receta.id, receta.datos(), version)
+    invalidar_receta(receta.id)
+    return resultado
 
 @my_app.route('/')
 def index():
@@ -59,7 +116,14 @@ def actualizar_receta(id_receta):
             receta.ingredientes = ingredientes
             receta.pasos = pasos
 
-            guardar_receta(receta)
+            # Se escribe sobre la misma clave solo si nadie la modificó desde que se abrió el formulario
+            resultado = reemplazar_receta(receta, request.form.get('version', type=int))
+            if resultado is False:
+                receta = cargar_receta(id_receta)
+                if receta:
+                    return render_template('actualizar_receta.html', receta=receta, conflicto=True)
+            if not resultado:
+                return "Receta no encontrada."
 
             return redirect(url_for('ver_listado_recetas'))
 
@@ -69,24 +133,25 @@ def actualizar_receta(id_receta):
 
 @my_app.route('/eliminar_receta/<int:id_receta>')
 def eliminar_receta(id_receta):
-    if redis_client.exists(f"receta:{id_receta}"):
-        redis_client.delete(f"receta:{id_receta}")
+    if borrar_receta(redis_client, id_receta):
+        invalidar_receta(id_receta)
         return redirect(url_for('ver_listado_recetas'))
     return "Receta no encontrada."
 
 @my_app.route('/ver_listado_recetas')
 def ver_listado_recetas():
-    claves_recetas = redis_client.keys("receta:*")
-    recetas = []
-
-    if claves_recetas:
-        for clave in claves_recetas:
-            receta_id = int(clave.split(":")[-1])
-            receta = cargar_receta(receta_id)
-            if receta:
-                recetas.append(receta)
-
-    return render_template('ver_listado_recetas.html', recetas=recetas)
+    despues_de = request.args.get('despues_de', 0, type=int)
+    limite = min(max(request.args.get('limite', LIMITE_POR_DEFECTO, type=int), 1), LIMITE_MAXIMO)
+    asegurar_indice()
+    ids, siguiente = pagina_ids_recetas(redis_client, despues_de, limite)
+    recetas = cargar_recetas_cacheadas(ids)
+
+    return render_template('ver_listado_recetas.html', recetas=recetas, siguiente=siguiente, limite=limite,
+                           primera_pagina=despues_de == 0)
+
+@my_app.route('/estadisticas_cache')
+def estadisticas_cache():
+    return jsonify(cache_recetas.estadisticas())
 
 if __name__ == "__main__":
     my_app.run(debug=True)
\ No newline at end of file
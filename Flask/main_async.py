@@ -0,0 +1,150 @@
+from quart import Quart, jsonify, render_template, request, redirect, url_for
+import redis
+import redis.asyncio
+from almacen import CLAVE_INDICE_COMPLETO
+from almacen_async import (actualizar_receta_guardada, borrar_receta, cargar_recetas, guardar_recetas,
+                           indexar_recetas, pagina_ids_recetas)
+from cache_recetas import CANAL_INVALIDACION, CacheRecetas
+from main import LIMITE_MAXIMO, LIMITE_POR_DEFECTO, REDIS_HOST, REDIS_PORT, Receta
+
+# Variante asíncrona (ASGI) de main.py con Quart, que tiene la misma API que Flask y usa las mismas
+# plantillas. Con los workers sync de Gunicorn cada solicitud ocupa un worker mientras espera a Redis
+# o a un cliente lento (de ahí los WORKER TIMEOUT); acá cada espera libera el event loop, así que un
+# solo worker atiende cientos de clientes a la vez.
+# Uso: uvicorn main_async:my_app --workers 4 --host 127.0.0.1 --port 5002
+
+my_app = Quart(__name__)
+
+# Conexiones a Redis que comparten todas las solicitudes del worker. Si están todas ocupadas, la
+# solicitud espera a que se libere una en lugar de abrir conexiones sin límite
+MAX_CONEXIONES = 50
+
+redis_client = None
+redis_binario = None
+
+# La misma caché en memoria de main.py. Su suscripción a las invalidaciones corre en un hilo aparte
+# con un cliente sync, así que no bloquea el event loop
+cache_recetas = CacheRecetas(capacidad=1000, ttl=60)
+redis_suscripcion = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, db=0)
+
+indice_verificado = False
+
+@my_app.before_serving
+async def conectar_redis():
+    # Los pools se crean dentro del event loop del worker que los va a usar
+    global redis_client, redis_binario
+    redis_client = redis.asyncio.Redis(connection_pool=redis.asyncio.BlockingConnectionPool(
+        host=REDIS_HOST, port=REDIS_PORT, db=0, max_connections=MAX_CONEXIONES, decode_responses=True))
+    # Las recetas se guardan en binario (codec.py), así que se leen y escriben con un cliente sin decode_responses
+    redis_binario = redis.asyncio.Redis(connection_pool=redis.asyncio.BlockingConnectionPool(
+        host=REDIS_HOST, port=REDIS_PORT, db=0, max_connections=MAX_CONEXIONES))
+
+@my_app.after_serving
+async def desconectar_redis():
+    await redis_client.aclose(close_connection_pool=True)
+    await redis_binario.aclose(close_connection_pool=True)
+
+async def cargar_recetas_cacheadas(ids):
+    """Devuelve las recetas que existen, en el orden de 'ids'; solo las que no están en la caché se piden a Redis."""
+    cache_recetas.escuchar_invalidaciones(redis_suscripcion)
+    recetas = {}
+    faltantes = []
+    # Marca tomada antes de leer de Redis: si hay una invalidación mientras tanto, lo leído no se guarda
+    marca = cache_recetas.marca()
+    for receta_id in ids:
+        receta = cache_recetas.obtener(receta_id)
+        if receta is None:
+            faltantes.append(receta_id)
+        else:
+            recetas[receta_id] = receta
+    for receta_id, datos in await cargar_recetas(redis_binario, faltantes):
+        recetas[receta_id] = Receta(id=receta_id, **datos)
+        cache_recetas.guardar(receta_id, recetas[receta_id], marca)
+    return [recetas[receta_id] for receta_id in ids if receta_id in recetas]
+
+async def cargar_receta(receta_id):
+    recetas = await cargar_recetas_cacheadas([receta_id])
+    if recetas:
+        return recetas[0]
+    return None
+
+async def invalidar_receta(receta_id):
+    """Descarta la receta de la caché de este worker y avisa a los demás (también a los de main.py)."""
+    cache_recetas.invalidar(receta_id)
+    await redis_client.publish(CANAL_INVALIDACION, receta_id)
+
+async def asegurar_indice():
+    global indice_verificado
+    if not indice_verificado:
+        if not await redis_client.exists(CLAVE_INDICE_COMPLETO):
+            await indexar_recetas(redis_client)
+        indice_verificado = True
+
+@my_app.route('/')
+async def index():
+    return await render_template('index.html')
+
+@my_app.route('/agregar_receta', methods=['GET', 'POST'])
+async def agregar_receta():
+    if request.method == 'POST':
+        formulario = await request.form
+        nueva_receta = Receta(formulario['nombre'], formulario['ingredientes'], formulario['pasos'])
+        nueva_receta.id = (await guardar_recetas(redis_binario, [nueva_receta.datos()]))[0]
+        await invalidar_receta(nueva_receta.id)
+
+        return redirect(url_for('ver_listado_recetas'))
+
+    return await render_template('agregar_receta.html')
+
+@my_app.route('/actualizar_receta/<int:id_receta>', methods=['GET', 'POST'])
+async def actualizar_receta(id_receta):
+    receta = await cargar_receta(id_receta)
+
+    if receta:
+        if request.method == 'POST':
+            formulario = await request.form
+            receta.nombre = formulario['nombre']
+            receta.ingredientes = formulario['ingredientes']
+            receta.pasos = formulario['pasos']
+
+            # Se escribe sobre la misma clave solo si nadie la modificó desde que se abrió el formulario
+            resultado = await actualizar_receta_guardada(redis_binario, receta.id, receta.datos(),
+                                                         formulario.get('version', type=int))
+            await invalidar_receta(receta.id)
+            if resultado is False:
+                receta = await cargar_receta(id_receta)
+                if receta:
+                    return await render_template('actualizar_receta.html', receta=receta, conflicto=True)
+            if not resultado:
+                return "Receta no encontrada."
+
+            return redirect(url_for('ver_listado_recetas'))
+
+        return await render_template('actualizar_receta.html', receta=receta)
+
+    return "Receta no encontrada."
+
+@my_app.route('/eliminar_receta/<int:id_receta>')
+async def eliminar_receta(id_receta):
+    if await borrar_receta(redis_client, id_receta):
+        await invalidar_receta(id_receta)
+        return redirect(url_for('ver_listado_recetas'))
+    return "Receta no encontrada."
+
+@my_app.route('/ver_listado_recetas')
+async def ver_listado_recetas():
+    despues_de = request.args.get('despues_de', 0, type=int)
+    limite = min(max(request.args.get('limite', LIMITE_POR_DEFECTO, type=int), 1), LIMITE_MAXIMO)
+    await asegurar_indice()
+    ids, siguiente = await pagina_ids_recetas(redis_client, despues_de, limite)
+    recetas = await cargar_recetas_cacheadas(ids)
+
+    return await render_template('ver_listado_recetas.html', recetas=recetas, siguiente=siguiente, limite=limite,
+                                 primera_pagina=despues_de == 0)
+
+@my_app.route('/estadisticas_cache')
+async def estadisticas_cache():
+    return jsonify(cache_recetas.estadisticas())
+
+if __name__ == "__main__":
+    my_app.run(debug=True)
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+# Prueba de carga para comparar main.py (Gunicorn, workers sync) con main_async.py (uvicorn, ASGI):
+# 'clientes' conexiones concurrentes piden la misma ruta una y otra vez durante 'segundos' y se
+# informan las solicitudes por segundo y las latencias p50/p99. Con --lentos se abren además
+# conexiones que envían la solicitud de a un byte por segundo, como un cliente con mala conexión:
+# cada una ocupa un worker sync entero, mientras que un worker async las atiende sin bloquearse.
+# Uso (con Redis local y cada servidor en su puerto):
+#   gunicorn -w 4 -b 127.0.0.1:5001 main:my_app
+#   uvicorn main_async:my_app --workers 4 --host 127.0.0.1 --port 5002
+#   python prueba_carga.py --servidor sync=http://127.0.0.1:5001 --servidor async=http://127.0.0.1:5002 \
+#       [--ruta /ver_listado_recetas] [--clientes 200] [--segundos 10] [--lentos 20] [--recetas 1000]
+
+TIEMPO_LIMITE = 30
+
+
+async def solicitar(host, puerto, ruta):
+    """Hace un GET con HTTP/1.0 (una conexión por solicitud) y devuelve el código de estado."""
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        escritor.write(f"GET {ruta} HTTP/1.0\r\nHost: {host}\r\n\r\n".encode())
+        await escritor.drain()
+        respuesta = await lector.read()
+        return int(respuesta.split(b' ', 2)[1])
+    finally:
+        escritor.close()
+
+
+async def cliente(host, puerto, ruta, fin, latencias, errores):
+    while time.monotonic() < fin:
+        inicio = time.perf_counter()
+        try:
+            estado = await asyncio.wait_for(solicitar(host, puerto, ruta), TIEMPO_LIMITE)
+        except (OSError, IndexError, ValueError, asyncio.TimeoutError):
+            estado = None
+        if estado == 200:
+            latencias.append(time.perf_counter() - inicio)
+        else:
+            errores.append(estado)
+
+
+async def cliente_lento(host, puerto, ruta, fin):
+    """Mantiene una conexión ocupada enviando la solicitud de a un byte por segundo hasta 'fin'."""
+    try:
+        lector, escritor = await asyncio.open_connection(host, puerto)
+    except OSError:
+        return
+    try:
+        for byte in f"GET {ruta} HTTP/1.0\r\nHost: {host}\r\nX-Relleno: {'x' * 3600}".encode():
+            if time.monotonic() >= fin:
+                break
+            escritor.write(bytes([byte]))
+            await escritor.drain()
+            await asyncio.sleep(1)
+    except OSError:
+        pass
+    finally:
+        escritor.close()
+
+
+def percentil(valores, p):
+    return valores[min(int(len(valores) * p), len(valores) - 1)] if valores else float('nan')
+
+
+async def probar(url, ruta, clientes, segundos, lentos):
+    partes = urlsplit(url)
+    host, puerto = partes.hostname, partes.port or 80
+    fin = time.monotonic() + segundos
+    latencias, errores = [], []
+    # Los clientes lentos se conectan primero, así ya ocupan workers cuando empieza la carga
+    tareas_lentas = [asyncio.create_task(cliente_lento(host, puerto, ruta, fin)) for _ in range(lentos)]
+    await asyncio.sleep(0.5)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(host, puerto, ruta, fin, latencias, errores) for _ in range(clientes)))
+    duracion = time.perf_counter() - inicio
+    await asyncio.gather(*tareas_lentas)
+    latencias.sort()
+    return len(latencias) / duracion, percentil(latencias, 0.5), percentil(latencias, 0.99), len(errores)
+
+
+def agregar_recetas(cantidad):
+    """Guarda 'cantidad' recetas de prueba en el Redis que usan las aplicaciones."""
+    import redis
+    from almacen import guardar_recetas
+    from main import REDIS_HOST, REDIS_PORT
+    redis_binario = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, db=0)
+    guardar_recetas(redis_binario, [{'nombre': f"Receta de prueba {i}", 'ingredientes': "harina, huevos, leche",
+                                     'pasos': "Mezclar, hornear y servir"} for i in range(cantidad)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la aplicación sync contra la async.")
+    parser.add_argument("--servidor", action="append", required=True, metavar="NOMBRE=URL",
+                        help="servidor a probar (se puede repetir)")
+    parser.add_argument("--ruta", default="/ver_listado_recetas")
+    parser.add_argument("--clientes", type=int, default=200, help="conexiones concurrentes")
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--lentos", type=int, default=0, help="clientes lentos que ocupan conexiones")
+    parser.add_argument("--recetas", type=int, default=0,
+                        help="recetas de prueba a agregar antes (se guardan en la base 0 de Redis)")
+    args = parser.parse_args()
+
+    if args.recetas:
+        agregar_recetas(args.recetas)
+
+    print(f"{args.clientes} clientes, {args.lentos} lentos, {args.segundos:g} s, GET {args.ruta}")
+    print(f"{'Servidor':<10}{'solicitudes/s':>15}{'p50 ms':>10}{'p99 ms':>10}{'errores':>10}")
+    for servidor in args.servidor:
+        nombre, url = servidor.split('=', 1)
+        por_segundo, p50, p99, errores = asyncio.run(probar(url, args.ruta, args.clientes, args.segundos, args.lentos))
+        print(f"{nombre:<10}{por_segundo:>15.1f}{p50 * 1000:>10.1f}{p99 * 1000:>10.1f}{errores:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import threading
+
+# Caché en Redis del HTML ya renderizado, compartida por todos los workers. Cada entrada guarda el
+# HTML y cuánto tardó en generarse, así cada acierto suma ese tiempo a lo ahorrado. Las claves llevan
+# la versión de lo que muestran (la del conjunto de recetas para las páginas, la de la receta para
+# sus fragmentos): cuando algo cambia se usan claves nuevas y las viejas vencen solas por TTL.
+
+PREFIJO = 'render'
+
+
+class CacheRender:
+    """Caché de HTML renderizado en Redis, con contadores de aciertos, fallos y tiempo ahorrado."""
+
+    def __init__(self, redis_client, ttl=300, prefijo=PREFIJO):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.prefijo = prefijo
+        self._lock = threading.Lock()
+        self.contadores = {'aciertos': 0, 'fallos': 0, 'segundos_ahorrados': 0.0}
+
+    def obtener(self, claves):
+        """Devuelve, para cada clave, (html, segundos que tardó en generarse) o None si no está."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for clave in claves:
+            pipe.hmget(f"{self.prefijo}:{clave}", 'html', 'segundos')
+        guardados = [(html, float(segundos)) if html is not None else None for html, segundos in pipe.execute()]
+        with self._lock:
+            for guardado in guardados:
+                if guardado is None:
+                    self.contadores['fallos'] += 1
+                else:
+                    self.contadores['aciertos'] += 1
+                    self.contadores['segundos_ahorrados'] += guardado[1]
+        return guardados
+
+    def guardar(self, renderizados):
+        """Guarda un dict clave -> (html, segundos que tardó en generarse) con el TTL de la caché."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for clave, (html, segundos) in renderizados.items():
+            pipe.hset(f"{self.prefijo}:{clave}", mapping={'html': html, 'segundos': segundos})
+            pipe.expire(f"{self.prefijo}:{clave}", self.ttl)
+        pipe.execute()
+
+    def estadisticas(self):
+        """Devuelve los contadores y la tasa de aciertos de este proceso."""
+        with self._lock:
+            estadisticas = dict(self.contadores, ttl=self.ttl)
+        consultas = estadisticas['aciertos'] + estadisticas['fallos']
+        estadisticas['tasa_aciertos'] = estadisticas['aciertos'] / consultas if consultas else 0.0
+        return estadisticas
@@ -1,42 +1,182 @@
-from flask import Flask, render_template, request, redirect, url_for
+import os
+import time
+from flask import Flask, render_template, request, redirect, url_for, g, jsonify
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 import redis
-import json
+from codec import CodecRecetas
+from cache_render import CacheRender
 
 app = Flask(__name__)
 
+# Las plantillas compiladas se guardan en disco, así un worker nuevo no las vuelve a compilar
+DIRECTORIO_PLANTILLAS_COMPILADAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_plantillas')
+os.makedirs(DIRECTORIO_PLANTILLAS_COMPILADAS, exist_ok=True)
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(DIRECTORIO_PLANTILLAS_COMPILADAS)}
+
 # Configuración de la conexión a Redis
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 
 # Cliente de Redis
 redis_client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+# Las recetas se guardan en binario (codec.py), así que se leen y escriben con un cliente sin decode_responses
+redis_binario = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT, db=0)
+
+# Formato de las recetas guardadas (msgpack si está instalado, struct si no)
+codec = CodecRecetas()
+
+# Conjunto ordenado con los IDs de las recetas (puntaje = ID, es decir, orden de creación)
+CLAVE_INDICE = 'recetas'
+# Versión del conjunto de recetas: aumenta con cada alta, modificación o baja y forma parte de la
+# clave de las páginas del listado guardadas en la caché de HTML. Las aplicaciones de Flask
+# (almacen.py y almacen_async.py) usan las mismas claves y también la aumentan al escribir
+CLAVE_VERSION = 'recetas:version'
+# Marca de que ya se indexaron las recetas guardadas antes de que existiera el índice
+CLAVE_INDICE_COMPLETO = 'recetas:indexado'
+# Canal en el que se publica el ID de cada receta agregada, modificada o eliminada, para que los
+# workers de la aplicación de Flask la descarten de su caché en memoria (ver Flask/cache_recetas.py)
+CANAL_INVALIDACION = 'recetas:invalidacion'
+
+# Recetas por página en el listado
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+
+indice_verificado = False
+
+# Caché del HTML renderizado (páginas del listado y fragmentos de cada receta), compartida por los workers
+cache_render = CacheRender(redis_client, ttl=300)
 
 # Definición de la clase Receta
+# (el ID va en la clave de Redis y la versión, que aumenta con cada modificación, en su propio campo)
 class Receta:
-    def __init__(self, nombre, ingredientes, pasos):
+    # Sin __dict__ por instancia: cada receta en memoria ocupa menos
+    __slots__ = ('nombre', 'ingredientes', 'pasos', 'id', 'version')
+
+    def __init__(self, nombre, ingredientes, pasos, id=None, version=0):
         self.nombre = nombre
         self.ingredientes = ingredientes
         self.pasos = pasos
+        self.id = id
+        self.version = version
+
+    # Campos que se guardan en Redis con codec.py (el ID va en la clave y la versión en su propio campo)
+    def datos(self):
+        return {'nombre': self.nombre, 'ingredientes': self.ingredientes, 'pasos': self.pasos}
+
+# Función para armar una receta a partir de sus datos codificados y su versión guardados en Redis
+def decodificar_receta(receta_id, valor, version):
+    return Receta(id=int(receta_id), version=int(version or 0), **codec.decodificar(valor))
 
 # Función para cargar una receta desde Redis
 def cargar_receta(receta_id):
-    receta_json = redis_client.hget(f"receta:{receta_id}", 'receta')
-    if receta_json:
-        receta_dict = json.loads(receta_json)
-        return Receta(**receta_dict)
+    valor, version = redis_binario.hmget(f"receta:{receta_id}", 'receta', 'version')
+    if valor:
+        return decodificar_receta(receta_id, valor, version)
     return None
 
-# Función para guardar una receta en Redis
+# Función para guardar una receta nueva en Redis (la receta y su entrada en el índice, en una transacción)
 def guardar_receta(receta):
-    receta_id = redis_client.incr('receta_id')
-    receta_json = json.dumps(receta.__dict__)
-    redis_client.hset(f"receta:{receta_id}", 'receta', receta_json)
+    receta.id = redis_client.incr('receta_id')
+    pipe = redis_binario.pipeline()
+    pipe.hset(f"receta:{receta.id}", 'receta', codec.codificar(receta.datos()))
+    pipe.zadd(CLAVE_INDICE, {receta.id: receta.id})
+    pipe.incr(CLAVE_VERSION)
+    pipe.publish(CANAL_INVALIDACION, receta.id)
+    pipe.execute()
+
+# Función para guardar los cambios de una receta en su misma clave, sin reservar un ID nuevo.
+# Con WATCH solo se escribe si la receta sigue en la versión 'version' (si se indica); si otra
+# escritura toca la clave antes del EXEC, redis-py reintenta y la versión se vuelve a comparar.
+# Devuelve la nueva versión, False si la versión no coincide o None si la receta no existe
+def reemplazar_receta(receta, version=None):
+    clave = f"receta:{receta.id}"
+
+    def actualizar(pipe):
+        existe, version_actual = pipe.exists(clave), int(pipe.hget(clave, 'version') or 0)
+        if not existe:
+            return None
+        if version is not None and version != version_actual:
+            return False
+        pipe.multi()
+        pipe.hset(clave, mapping={'receta': codec.codificar(receta.datos()), 'version': version_actual + 1})
+        pipe.incr(CLAVE_VERSION)
+        pipe.publish(CANAL_INVALIDACION, receta.id)
+        return version_actual + 1
+
+    return redis_binario.transaction(actualizar, clave, value_from_callable=True)
+
+# Función para crear el índice con las recetas guardadas antes de que existiera (una vez por proceso)
+def asegurar_indice():
+    global indice_verificado
+    if not indice_verificado:
+        if not redis_client.exists(CLAVE_INDICE_COMPLETO):
+            pipe = redis_client.pipeline(transaction=False)
+            for clave in redis_client.scan_iter(match="receta:*", count=1000):
+                receta_id = int(clave.split(":")[-1])
+                pipe.zadd(CLAVE_INDICE, {receta_id: receta_id})
+            pipe.set(CLAVE_INDICE_COMPLETO, 1)
+            pipe.execute()
+        indice_verificado = True
+
+# Función para cargar una página de recetas: hasta 'limite' IDs posteriores a 'despues_de' con
+# ZRANGEBYSCORE (O(log N + limite)) y sus recetas en un solo pipeline. Devuelve las recetas y el
+# cursor de la página siguiente (o None)
+def cargar_pagina_recetas(despues_de, limite):
+    ids = redis_client.zrangebyscore(CLAVE_INDICE, f"({despues_de}", '+inf', start=0, num=limite + 1)
+    siguiente = int(ids[limite - 1]) if len(ids) > limite else None
+    pipe = redis_binario.pipeline(transaction=False)
+    for receta_id in ids[:limite]:
+        pipe.hmget(f"receta:{receta_id}", 'receta', 'version')
+    recetas = [decodificar_receta(receta_id, valor, version)
+               for receta_id, (valor, version) in zip(ids, pipe.execute()) if valor]
+    return recetas, siguiente
+
+# Función para devolver el HTML guardado en la caché con la clave indicada o generarlo con 'generar'
+# y guardarlo junto con lo que tardó. Lo ahorrado se suma a g.segundos_ahorrados
+def renderizar_cacheado(clave, generar):
+    guardado = cache_render.obtener([clave])[0]
+    if guardado:
+        g.segundos_ahorrados += guardado[1]
+        return guardado[0]
+    inicio = time.perf_counter()
+    html = generar()
+    cache_render.guardar({clave: (html, time.perf_counter() - inicio)})
+    return html
+
+# Función para obtener el fragmento HTML de cada receta del listado, renderizando solo los que no
+# están en la caché (la clave lleva la versión de la receta, así una receta modificada se vuelve a renderizar)
+def renderizar_recetas(recetas):
+    claves = [f"receta:{receta.id}:{receta.version}" for receta in recetas]
+    fragmentos, nuevos = [], {}
+    for receta, clave, guardado in zip(recetas, claves, cache_render.obtener(claves)):
+        if guardado:
+            g.segundos_ahorrados += guardado[1]
+            html = guardado[0]
+        else:
+            inicio = time.perf_counter()
+            html = render_template('receta_listado.html', receta=receta)
+            nuevos[clave] = (html, time.perf_counter() - inicio)
+        fragmentos.append(Markup(html))
+    if nuevos:
+        cache_render.guardar(nuevos)
+    return fragmentos
+
+@app.before_request
+def iniciar_tiempo_ahorrado():
+    g.segundos_ahorrados = 0.0
+
+# Informa en cada respuesta cuánto tiempo de renderizado se ahorró gracias a la caché
+@app.after_request
+def informar_tiempo_ahorrado(respuesta):
+    respuesta.headers['X-Render-Ahorrado-ms'] = f"{g.get('segundos_ahorrados', 0.0) * 1000:.3f}"
+    return respuesta
 
 # Ruta para la página principal
 @app.route('/')
 def index():
-    # Renderiza la plantilla 'index.html' usando Jinja2
-    return render_template('index.html')
+    # Renderiza la plantilla 'index.html' usando Jinja2 (o la toma de la caché)
+    return renderizar_cacheado('index', lambda: render_template('index.html'))
 
 # Ruta para agregar una nueva receta
 @app.route('/agregar_receta', methods=['GET', 'POST'])
@@ -51,8 +191,8 @@ def agregar_receta():
 
         return redirect(url_for('ver_listado_recetas'))
 
-    # Renderiza la plantilla 'agregar_receta.html' usando Jinja2
-    return render_template('agregar_receta.html')
+    # Renderiza la plantilla 'agregar_receta.html' usando Jinja2 (o la toma de la caché)
+    return renderizar_cacheado('agregar_receta', lambda: render_template('agregar_receta.html'))
 
 # Ruta para actualizar una receta existente
 @app.route('/actualizar_receta/<int:id_receta>', methods=['GET', 'POST'])
@@ -69,7 +209,15 @@ def actualizar_receta(id_receta):
             receta.ingredientes = ingredientes
             receta.pasos = pasos
 
-            guardar_receta(receta)
+            # Se escribe sobre la misma clave solo si nadie la modificó desde que se abrió el formulario
+            resultado = reemplazar_receta(receta, request.form.get('version', type=int))
+            if resultado is False:
+                receta = cargar_receta(id_receta)
+                if receta:
+                    # Renderiza el formulario con los datos actuales y el aviso de conflicto
+                    return render_template('actualizar_receta.html', receta=receta, conflicto=True)
+            if not resultado:
+                return "Receta no encontrada."
 
             return redirect(url_for('ver_listado_recetas'))
 
@@ -81,26 +229,38 @@ def actualizar_receta(id_receta):
 # Ruta para eliminar una receta
 @app.route('/eliminar_receta/<int:id_receta>')
 def eliminar_receta(id_receta):
-    if redis_client.exists(f"receta:{id_receta}"):
-        redis_client.delete(f"receta:{id_receta}")
+    pipe = redis_client.pipeline()
+    pipe.delete(f"receta:{id_receta}")
+    pipe.zrem(CLAVE_INDICE, id_receta)
+    pipe.incr(CLAVE_VERSION)
+    pipe.publish(CANAL_INVALIDACION, id_receta)
+    eliminadas, _, _, _ = pipe.execute()
+    if eliminadas:
         return redirect(url_for('ver_listado_recetas'))
     return "Receta no encontrada."
 
 # Ruta para ver el listado de recetas
 @app.route('/ver_listado_recetas')
 def ver_listado_recetas():
-    claves_recetas = redis_client.keys("receta:*")
-    recetas = []
-
-    if claves_recetas:
-        for clave in claves_recetas:
-            receta_id = int(clave.split(":")[-1])
-            receta = cargar_receta(receta_id)
-            if receta:
-                recetas.append(receta)
-
-    # Renderiza la plantilla 'ver_listado_recetas.html' usando Jinja2 y pasa el objeto recetas
-    return render_template('ver_listado_recetas.html', recetas=recetas)
+    # Página pedida: recetas posteriores al ID 'despues_de', de a 'limite' (entre 1 y LIMITE_MAXIMO)
+    despues_de = request.args.get('despues_de', 0, type=int)
+    limite = min(max(request.args.get('limite', LIMITE_POR_DEFECTO, type=int), 1), LIMITE_MAXIMO)
+    asegurar_indice()
+
+    def generar():
+        recetas, siguiente = cargar_pagina_recetas(despues_de, limite)
+        # Renderiza la plantilla 'ver_listado_recetas.html' usando Jinja2 con el fragmento de cada receta
+        return render_template('ver_listado_recetas.html', fragmentos=renderizar_recetas(recetas),
+                               siguiente=siguiente, limite=limite, primera_pagina=despues_de == 0)
+
+    # La página guardada sirve mientras no cambie ninguna receta (cambia la versión del conjunto)
+    version = redis_client.get(CLAVE_VERSION) or 0
+    return renderizar_cacheado(f"pagina:{version}:{despues_de}:{limite}", generar)
+
+# Ruta para ver los contadores de la caché de HTML de este proceso
+@app.route('/estadisticas_render')
+def estadisticas_render():
+    return jsonify(cache_render.estadisticas())
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -1,6 +1,29 @@
-from pymongo import MongoClient
+from pymongo import ASCENDING, InsertOne, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 from bson import ObjectId
+from bson.errors import InvalidId
 from hashlib import sha256
+from functools import wraps
+from itertools import islice
+import copy
+import inspect
+import re
+import time
+import unicodedata
+
+# Solo se traen estos campos al listar o buscar recetas
+RECIPE_SUMMARY = {"receta": 1}
+# Documentos por lote al completar los ingredientes normalizados de recetas anteriores
+MIGRATION_BATCH_SIZE = 500
+# Operaciones por bulk_write en las altas, modificaciones y bajas masivas
+BULK_BATCH_SIZE = 1000
+# Documentos que trae el cursor en cada ida y vuelta al listar
+LIST_BATCH_SIZE = 500
+# Segundos que se guardan los resultados de las estadísticas (se descartan antes si hay escrituras)
+ANALYTICS_TTL = 300
+
+# (base, función, argumentos) -> (vencimiento, resultado)
+_analytics_cache = {}
 
 
 def create_connection():
@@ -8,12 +31,148 @@ def create_connection():
     try:
         client = MongoClient("mongodb://localhost:27017/")
         db = client["recetario"]
+        ensure_indexes(db)
         return db
     except Exception as e:
         print(f"Error al conectar a la base de datos: {e}")
         return None
 
 
+def normalize_ingredient(nombre):
+    """Normaliza el nombre de un ingrediente: minúsculas, sin acentos y con los espacios simplificados."""
+    nombre = unicodedata.normalize('NFKD', nombre.lower())
+    nombre = ''.join(c for c in nombre if not unicodedata.combining(c))
+    return ' '.join(nombre.split())
+
+
+def ingredient_keys(ingredientes):
+    """Devuelve los nombres normalizados y sin repetir de una lista de ingredientes, para el índice multikey."""
+    nombres = (normalize_ingredient(ingrediente) for ingrediente in ingredientes)
+    return list(dict.fromkeys(nombre for nombre in nombres if nombre))
+
+
+def user_recipes_query(id_usuario):
+    """Filtro de las recetas de un usuario (usa el índice id_usuario_1__id_1)."""
+    return {"id_usuario": id_usuario}
+
+
+def ingredient_query(ingrediente):
+    """Filtro de las recetas con un ingrediente que empieza por el nombre buscado.
+
+    Es una expresión regular anclada al inicio y sin opciones sobre el campo normalizado, así que
+    MongoDB la resuelve como un rango del índice multikey en vez de recorrer la colección.
+    Devuelve None si el nombre queda vacío: "^" solo encontraría todas las recetas.
+    """
+    nombre = normalize_ingredient(ingrediente)
+    if not nombre:
+        return None
+    return {"ingredientes_normalizados": {"$regex": "^" + re.escape(nombre)}}
+
+
+def batches(iterable, size):
+    """Genera listas de hasta 'size' elementos de un iterable, sin cargarlo completo en memoria."""
+    iterator = iter(iterable)
+    while lote := list(islice(iterator, size)):
+        yield lote
+
+
+def recipe_id(id_receta):
+    """Convierte el ID de una receta (texto u ObjectId) a ObjectId; devuelve el valor tal cual si no es válido."""
+    try:
+        return ObjectId(id_receta)
+    except (InvalidId, TypeError):
+        return id_receta
+
+
+def recipe_document(receta, ingredientes, pasos, id_usuario):
+    """Arma el documento de una receta nueva."""
+    return {"receta": receta, "ingredientes": ingredientes, "pasos": pasos, "id_usuario": id_usuario,
+            "ingredientes_normalizados": ingredient_keys(ingredientes)}
+
+
+def recipe_changes(receta=None, ingredientes=None, pasos=None):
+    """Arma el $set con los campos a modificar de una receta."""
+    update_query = {}
+
+    if receta is not None:
+        update_query["receta"] = receta
+
+    if ingredientes is not None:
+        update_query["ingredientes"] = ingredientes
+        update_query["ingredientes_normalizados"] = ingredient_keys(ingredientes)
+
+    if pasos is not None:
+        update_query["pasos"] = pasos
+
+    return {"$set": update_query}
+
+
+def _bulk_write(recetas, operaciones, resultado):
+    """Ejecuta un lote de operaciones sin orden y devuelve el campo 'resultado' (p. ej. 'nInserted'), aunque fallen algunas."""
+    try:
+        return recetas.bulk_write(operaciones, ordered=False).bulk_api_result[resultado]
+    except BulkWriteError as e:
+        # Con ordered=False el servidor sigue con el resto del lote cuando una operación falla
+        print(f"{len(e.details['writeErrors'])} operaciones fallidas en el lote")
+        return e.details[resultado]
+    finally:
+        invalidate_analytics()
+
+
+def invalidate_analytics():
+    """Descarta las estadísticas guardadas; se llama después de cada escritura de recetas."""
+    _analytics_cache.clear()
+
+
+def cached_analytics(funcion):
+    """Guarda el resultado de una estadística durante ANALYTICS_TTL segundos o hasta la próxima escritura."""
+    firma = inspect.signature(funcion)
+
+    @wraps(funcion)
+    def envoltura(db, *args, **kwargs):
+        # La clave sale de los argumentos ya asociados a los parámetros (con sus valores por defecto),
+        # así f(db), f(db, 10) y f(db, limite=10) comparten el mismo resultado
+        argumentos = firma.bind(db, *args, **kwargs)
+        argumentos.apply_defaults()
+        clave = (db.name, funcion.__name__, tuple(argumentos.arguments.items())[1:])
+        guardado = _analytics_cache.get(clave)
+        if guardado is not None and guardado[0] > time.monotonic():
+            # Copia: quien la recibe puede modificarla sin tocar lo guardado
+            return copy.deepcopy(guardado[1])
+        resultado = funcion(db, *args, **kwargs)
+        if resultado is not None:
+            _analytics_cache[clave] = (time.monotonic() + ANALYTICS_TTL, copy.deepcopy(resultado))
+        return resultado
+    return envoltura
+
+
+def ensure_indexes(db):
+    """Crea los índices de las consultas frecuentes (si ya existen no hace nada) y completa los ingredientes normalizados."""
+    try:
+        db["usuarios"].create_index([("usuario", ASCENDING)], unique=True)
+        db["usuarios"].create_index([("email", ASCENDING)], unique=True)
+        db["recetas"].create_index([("id_usuario", ASCENDING), ("_id", ASCENDING)])
+        db["recetas"].create_index([("ingredientes_normalizados", ASCENDING)])
+        migrate_ingredient_keys(db)
+    except Exception as e:
+        print(f"Error al crear los índices: {e}")
+
+
+def migrate_ingredient_keys(db, batch_size=MIGRATION_BATCH_SIZE):
+    """Agrega 'ingredientes_normalizados' a las recetas guardadas antes de que existiera el campo."""
+    recetas = db["recetas"]
+    pendientes = recetas.find({"ingredientes_normalizados": {"$exists": False}}, {"ingredientes": 1})
+    migradas = 0
+    for lote in batches(pendientes, batch_size):
+        migradas += _bulk_write(recetas, [
+            UpdateOne({"_id": receta["_id"]},
+                      {"$set": {"ingredientes_normalizados": ingredient_keys(receta.get("ingredientes") or [])}})
+            for receta in lote], "nModified")
+    if migradas:
+        print(f"Ingredientes normalizados para {migradas} recetas.")
+    return migradas
+
+
 def hash_password(password):
     """Hashea una contraseña utilizando el algoritmo SHA-256."""
     return sha256(password.encode()).hexdigest()
@@ -23,7 +182,7 @@ def create_user(db, usuario, contrasena, email):
     """Crea un nuevo usuario en la base de datos."""
     try:
         usuarios = db["usuarios"]
-        existing_user_email = usuarios.find_one({"$or": [{"usuario": usuario}, {"email": email}]})
+        existing_user_email = usuarios.find_one({"$or": [{"usuario": usuario}, {"email": email}]}, {"usuario": 1})
 
         if existing_user_email:
             if existing_user_email["usuario"] == usuario:
@@ -43,7 +202,7 @@ def log_in(db, usuario, contrasena):
     try:
         usuarios = db["usuarios"]
         hashed_password = hash_password(contrasena)
-        user = usuarios.find_one({"usuario": usuario, "contrasena": hashed_password})
+        user = usuarios.find_one({"usuario": usuario, "contrasena": hashed_password}, {"_id": 1})
 
         if user:
             print("¡Bienvenido a su recetario!")
@@ -59,54 +218,109 @@ def add_recipe(db, receta, ingredientes, pasos, id_usuario):
     """Agrega una nueva receta a la base de datos."""
     try:
         recetas = db["recetas"]
-        recetas.insert_one({"receta": receta, "ingredientes": ingredientes, "pasos": pasos, "id_usuario": id_usuario})
+        recetas.insert_one(recipe_document(receta, ingredientes, pasos, id_usuario))
+        invalidate_analytics()
         print("¡Receta agregada con éxito!")
     except Exception as e:
         print(f"Error al agregar receta: {e}")
 
 
+def add_recipes(db, recetas_nuevas, id_usuario=None, batch_size=BULK_BATCH_SIZE):
+    """Agrega muchas recetas con bulk_write sin orden, en lotes de 'batch_size'.
+
+    'recetas_nuevas' es un iterable de diccionarios con "receta", "ingredientes", "pasos" y,
+    opcionalmente, "id_usuario" ('id_usuario' se usa para las que no lo traen). Devuelve la
+    cantidad de recetas agregadas.
+    """
+    agregadas = 0
+    try:
+        recetas = db["recetas"]
+        for lote in batches(recetas_nuevas, batch_size):
+            agregadas += _bulk_write(recetas, [
+                InsertOne(recipe_document(nueva["receta"], nueva["ingredientes"], nueva["pasos"],
+                                          nueva.get("id_usuario", id_usuario)))
+                for nueva in lote], "nInserted")
+        print(f"¡{agregadas} recetas agregadas con éxito!")
+    except Exception as e:
+        print(f"Error al agregar recetas: {e}")
+    return agregadas
+
+
 def update_recipe(db, id_receta, receta=None, ingredientes=None, pasos=None):
     """Modifica una receta existente en la base de datos."""
     try:
         recetas = db["recetas"]
-        update_query = {}
-
-        if receta is not None:
-            update_query["receta"] = receta
+        recetas.update_one({"_id": recipe_id(id_receta)}, recipe_changes(receta, ingredientes, pasos))
+        invalidate_analytics()
+        print("¡Receta modificada con éxito!")
+    except Exception as e:
+        print(f"Error al modificar receta: {e}")
 
-        if ingredientes is not None:
-            update_query["ingredientes"] = ingredientes
 
-        if pasos is not None:
-            update_query["pasos"] = pasos
+def update_recipes(db, cambios, batch_size=BULK_BATCH_SIZE):
+    """Modifica muchas recetas con bulk_write sin orden, en lotes de 'batch_size'.
 
-        recetas.update_one({"_id": id_receta}, {"$set": update_query})
-        print("¡Receta modificada con éxito!")
+    'cambios' es un iterable de diccionarios con "_id" y los campos a modificar ("receta",
+    "ingredientes" y/o "pasos"). Devuelve la cantidad de recetas modificadas.
+    """
+    modificadas = 0
+    try:
+        recetas = db["recetas"]
+        for lote in batches(cambios, batch_size):
+            modificadas += _bulk_write(recetas, [
+                UpdateOne({"_id": recipe_id(cambio["_id"])},
+                          recipe_changes(cambio.get("receta"), cambio.get("ingredientes"), cambio.get("pasos")))
+                for cambio in lote], "nModified")
+        print(f"¡{modificadas} recetas modificadas con éxito!")
     except Exception as e:
-        print(f"Error al modificar receta: {e}")
+        print(f"Error al modificar recetas: {e}")
+    return modificadas
 
 
 def delete_recipe(db, id_receta):
     """Elimina una receta de la base de datos."""
     try:
         recetas = db["recetas"]
-        recetas.delete_one({"_id": id_receta})
+        recetas.delete_one({"_id": recipe_id(id_receta)})
+        invalidate_analytics()
         print("¡Receta eliminada con éxito!")
     except Exception as e:
         print(f"Error al eliminar receta: {e}")
 
 
-def list_recipes(db, id_usuario):
-    """Lista todas las recetas de un usuario específico."""
+def delete_recipes(db, ids_recetas, batch_size=BULK_BATCH_SIZE):
+    """Elimina muchas recetas con un delete_many por lote de 'batch_size' IDs. Devuelve la cantidad eliminada."""
+    eliminadas = 0
     try:
         recetas = db["recetas"]
-        user_recipes = recetas.find({"id_usuario": id_usuario})
+        for lote in batches(ids_recetas, batch_size):
+            eliminadas += recetas.delete_many({"_id": {"$in": [recipe_id(id_receta) for id_receta in lote]}}).deleted_count
+            invalidate_analytics()
+        print(f"¡{eliminadas} recetas eliminadas con éxito!")
+    except Exception as e:
+        print(f"Error al eliminar recetas: {e}")
+    return eliminadas
 
-        if user_recipes:
-            print("Listado de recetas:")
-            for receta in user_recipes:
-                print(f"ID: {receta['_id']}\nReceta: {receta['receta']}")
-        else:
+
+def iter_user_recipes(db, id_usuario, batch_size=LIST_BATCH_SIZE):
+    """Genera el _id y el nombre de las recetas de un usuario; el cursor las trae de a 'batch_size'."""
+    recetas = db["recetas"]
+    yield from (recetas.find(user_recipes_query(id_usuario), RECIPE_SUMMARY)
+                .sort("_id", ASCENDING)
+                .batch_size(batch_size))
+
+
+def list_recipes(db, id_usuario, batch_size=LIST_BATCH_SIZE):
+    """Lista todas las recetas de un usuario específico."""
+    try:
+        listadas = 0
+        for receta in iter_user_recipes(db, id_usuario, batch_size):
+            if not listadas:
+                print("Listado de recetas:")
+            print(f"ID: {receta['_id']}\nReceta: {receta['receta']}")
+            listadas += 1
+
+        if not listadas:
             print("No hay recetas disponibles.")
     except Exception as e:
         print(f"Error al listar recetas: {e}")
@@ -137,8 +351,9 @@ def search_recipe_by_ingredient(db, ingrediente):
     """Busca recetas que contengan un ingrediente específico."""
     try:
         recetas = db["recetas"]
-        ingredient_query = {"ingredientes": {"$regex": ingrediente, "$options": "i"}}
-        found_recipes = recetas.find(ingredient_query)
+        filtro = ingredient_query(ingrediente)
+        # list(): un cursor siempre es verdadero, aunque no traiga ninguna receta
+        found_recipes = list(recetas.find(filtro, RECIPE_SUMMARY)) if filtro else []
 
         if found_recipes:
             print(f"Recetas que contienen '{ingrediente}':")
@@ -150,6 +365,69 @@ def search_recipe_by_ingredient(db, ingrediente):
         print(f"Error al buscar receta por ingrediente: {e}")
 
 
+@cached_analytics
+def most_common_ingredients(db, limite=10):
+    """Devuelve los ingredientes más usados como [{"ingrediente", "recetas"}], calculados en el servidor."""
+    try:
+        return list(db["recetas"].aggregate([
+            # Recorre toda la colección (COLLSCAN): cuenta todas las recetas y un índice multikey no
+            # puede cubrir la consulta. El $project deja solo los ingredientes para $unwind y el
+            # resultado queda guardado por cached_analytics hasta la próxima escritura
+            {"$project": {"_id": 0, "ingredientes_normalizados": 1}},
+            {"$unwind": "$ingredientes_normalizados"},
+            {"$group": {"_id": "$ingredientes_normalizados", "recetas": {"$sum": 1}}},
+            {"$sort": {"recetas": -1, "_id": 1}},
+            {"$limit": limite},
+            {"$project": {"_id": 0, "ingrediente": "$_id", "recetas": 1}},
+        ]))
+    except Exception as e:
+        print(f"Error al calcular los ingredientes más usados: {e}")
+        return None
+
+
+@cached_analytics
+def recipes_per_user(db, limite=10):
+    """Devuelve los usuarios con más recetas como [{"id_usuario", "usuario", "recetas"}]."""
+    try:
+        return list(db["recetas"].aggregate([
+            # Ordenar por id_usuario antes de agrupar permite recorrer el índice (id_usuario, _id)
+            # sin leer los documentos
+            {"$sort": {"id_usuario": 1}},
+            {"$group": {"_id": "$id_usuario", "recetas": {"$sum": 1}}},
+            {"$sort": {"recetas": -1, "_id": 1}},
+            {"$limit": limite},
+            {"$lookup": {"from": "usuarios", "localField": "_id", "foreignField": "_id", "as": "usuario"}},
+            {"$project": {"_id": 0, "id_usuario": "$_id", "recetas": 1,
+                          "usuario": {"$arrayElemAt": ["$usuario.usuario", 0]}}},
+        ]))
+    except Exception as e:
+        print(f"Error al calcular las recetas por usuario: {e}")
+        return None
+
+
+@cached_analytics
+def similar_recipes(db, id_receta, limite=10):
+    """Devuelve las recetas que comparten ingredientes con una receta como [{"_id", "receta", "compartidos"}]."""
+    try:
+        id_receta = recipe_id(id_receta)
+        receta = db["recetas"].find_one({"_id": id_receta}, {"ingredientes_normalizados": 1})
+        if receta is None:
+            return []
+        ingredientes = receta.get("ingredientes_normalizados") or []
+        return list(db["recetas"].aggregate([
+            # $in sobre el índice multikey: solo se leen las recetas con algún ingrediente en común
+            {"$match": {"ingredientes_normalizados": {"$in": ingredientes}, "_id": {"$ne": id_receta}}},
+            {"$project": {"receta": 1, "compartidos": {
+                "$size": {"$filter": {"input": "$ingredientes_normalizados",
+                                      "cond": {"$in": ["$$this", ingredientes]}}}}}},
+            {"$sort": {"compartidos": -1, "_id": 1}},
+            {"$limit": limite},
+        ]))
+    except Exception as e:
+        print(f"Error al buscar recetas similares: {e}")
+        return None
+
+
 def main():
     db = create_connection()
     if db is None:
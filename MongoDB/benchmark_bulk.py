@@ -0,0 +1,78 @@
+import argparse
+import contextlib
+import io
+import time
+
+from pymongo import MongoClient
+
+from Recetario import (add_recipe, add_recipes, delete_recipe, delete_recipes, ensure_indexes, iter_user_recipes,
+                       update_recipe, update_recipes)
+
+# Compara en documentos por segundo las operaciones de a una (una ida y vuelta por receta) con las
+# masivas (bulk_write sin orden por lotes), y el listado con distintos batch_size del cursor.
+# Usa una base de datos temporal que se borra al terminar.
+# Uso: python benchmark_bulk.py [--uri mongodb://localhost:27017/] [--docs 20000]
+#      python benchmark_bulk.py --mock   (con mongomock, sin servidor)
+
+BASE_DE_PRUEBA = "recetario_benchmark"
+
+
+def receta_de_prueba(i):
+    return {"receta": f"receta {i}", "ingredientes": ["Harina", "Huevos", f"Ingrediente {i % 100}"],
+            "pasos": ["Mezclar", "Hornear"]}
+
+
+def medir(nombre, cantidad, funcion):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"{nombre:<34}{cantidad / segundos:>14.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de operaciones masivas del recetario en MongoDB.")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/")
+    parser.add_argument("--docs", type=int, default=20000, help="recetas por prueba")
+    parser.add_argument("--mock", action="store_true", help="usar mongomock en vez de un servidor")
+    args = parser.parse_args()
+
+    if args.mock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        client = MongoClient(args.uri)
+    client.drop_database(BASE_DE_PRUEBA)
+    db = client[BASE_DE_PRUEBA]
+    ensure_indexes(db)
+    docs = args.docs
+    id_usuario = 1
+
+    print(f"{docs} recetas{' (mongomock)' if args.mock else ''}")
+    print(f"{'Operación':<34}{'docs/s':>14}")
+    try:
+        medir("insert_one de a una", docs, lambda: [
+            add_recipe(db, r["receta"], r["ingredientes"], r["pasos"], id_usuario)
+            for r in map(receta_de_prueba, range(docs))])
+        ids = [receta["_id"] for receta in iter_user_recipes(db, id_usuario)]
+        medir("update_one de a una", docs, lambda: [
+            update_recipe(db, id_receta, pasos=["Mezclar", "Hornear", "Servir"]) for id_receta in ids])
+        medir("delete_one de a una", docs, lambda: [delete_recipe(db, id_receta) for id_receta in ids])
+
+        medir("add_recipes (bulk_write)", docs, lambda: add_recipes(
+            db, map(receta_de_prueba, range(docs)), id_usuario))
+        ids = [receta["_id"] for receta in iter_user_recipes(db, id_usuario)]
+        medir("update_recipes (bulk_write)", docs, lambda: update_recipes(
+            db, ({"_id": id_receta, "pasos": ["Mezclar", "Hornear", "Servir"]} for id_receta in ids)))
+
+        for batch_size in (10, 101, 500, 2000):
+            medir(f"listar con batch_size={batch_size}", docs, lambda: sum(
+                1 for _ in iter_user_recipes(db, id_usuario, batch_size)))
+
+        medir("delete_recipes (delete_many)", docs, lambda: delete_recipes(db, ids))
+    finally:
+        client.drop_database(BASE_DE_PRUEBA)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+
+from bson import ObjectId
+from pymongo import ASCENDING, MongoClient
+
+from Recetario import (RECIPE_SUMMARY, add_recipe, ensure_indexes, hash_password, ingredient_query,
+                       user_recipes_query)
+
+# Comprueba con explain() que cada consulta frecuente de Recetario.py usa un índice (IXSCAN o la
+# búsqueda directa por _id) y ninguna recorre la colección completa (COLLSCAN).
+# Usa una base de datos temporal que se borra al terminar.
+# Uso: python explicar_consultas.py [mongodb://localhost:27017/]
+
+BASE_DE_PRUEBA = "recetario_explain"
+ETAPAS_CON_INDICE = {"IXSCAN", "IDHACK", "EXPRESS_IXSCAN"}
+
+
+def etapas(plan):
+    """Devuelve los nombres de todas las etapas de un plan de ejecución, recorriendo sus etapas de entrada."""
+    plan = plan.get("queryPlan", plan)  # Con el motor SBE (MongoDB 7+) el plan viene anidado
+    nombres = [plan["stage"]]
+    if "inputStage" in plan:
+        nombres += etapas(plan["inputStage"])
+    for entrada in plan.get("inputStages", []):
+        nombres += etapas(entrada)
+    return nombres
+
+
+def verificar(nombre, cursor):
+    """Imprime las etapas del plan ganador de 'cursor' y devuelve True si usa un índice sin COLLSCAN."""
+    plan = cursor.explain()["queryPlanner"]["winningPlan"]
+    nombres = etapas(plan)
+    correcto = "COLLSCAN" not in nombres and bool(ETAPAS_CON_INDICE & set(nombres))
+    print(f"{'OK   ' if correcto else 'FALLA'} {nombre:<32}{' <- '.join(nombres)}")
+    return correcto
+
+
+def main():
+    client = MongoClient(sys.argv[1] if len(sys.argv) > 1 else "mongodb://localhost:27017/")
+    client.drop_database(BASE_DE_PRUEBA)
+    db = client[BASE_DE_PRUEBA]
+    try:
+        ensure_indexes(db)
+        id_usuario = db["usuarios"].insert_one(
+            {"usuario": "ana", "contrasena": hash_password("secreto"), "email": "ana@example.com"}).inserted_id
+        add_recipe(db, "Tortilla", ["Huevos", "Papas", "Cebolla"], ["Batir", "Freír"], id_usuario)
+        add_recipe(db, "Panqueques", ["Harina", "Huevos", "Leche"], ["Mezclar", "Cocinar"], id_usuario)
+        id_receta = db["recetas"].find_one({}, {"_id": 1})["_id"]
+
+        usuarios = db["usuarios"]
+        recetas = db["recetas"]
+        resultados = [
+            verificar("create_user (usuario o email)",
+                      usuarios.find({"$or": [{"usuario": "ana"}, {"email": "ana@example.com"}]}, {"usuario": 1})),
+            verificar("log_in",
+                      usuarios.find({"usuario": "ana", "contrasena": hash_password("secreto")}, {"_id": 1})),
+            verificar("list_recipes",
+                      recetas.find(user_recipes_query(id_usuario), RECIPE_SUMMARY).sort("_id", ASCENDING)),
+            verificar("view_recipe_details", recetas.find({"_id": ObjectId(id_receta)})),
+            verificar("search_recipe_by_ingredient", recetas.find(ingredient_query("huevo"), RECIPE_SUMMARY)),
+        ]
+    finally:
+        client.drop_database(BASE_DE_PRUEBA)
+    if not all(resultados):
+        print("Hay consultas que no usan un índice.")
+        sys.exit(1)
+    print("Todas las consultas frecuentes usan un índice.")
+
+
+if __name__ == "__main__":
+    main()
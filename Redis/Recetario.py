@@ -2,10 +2,14 @@ import redis
 import uuid
 from hashlib import sha256
 
+# Marca de que ya se indexaron las recetas guardadas antes de que existieran los índices
+INDEXES_MIGRATED_KEY = "recipes:indexed"
+
 def create_connection():
-    """Crea una conexión a la base de datos Redis."""
+    """Crea una conexión a la base de datos Redis y completa los índices si hace falta."""
     try:
         r = redis.Redis(host='localhost', port=6379, db=0)
+        ensure_indexes(r)
         return r
     except Exception as e:
         print(f"Error al conectar a la base de datos: {e}")
@@ -23,8 +27,7 @@ def create_user(r, usuario, contrasena, email):
             print("El nombre de usuario ya está en uso. Por favor, elija otro.")
         else:
             hashed_password = hash_password(contrasena)
-            r.hset(user_key, "contrasena", hashed_password)
-            r.hset(user_key, "email", email)
+            r.hset(user_key, mapping={"contrasena": hashed_password, "email": email})
             print("¡Usuario creado con éxito!")
     except Exception as e:
         print(f"Error al crear usuario: {e}")
@@ -33,10 +36,10 @@ def log_in(r, usuario, contrasena):
     """Verifica las credenciales de inicio de sesión y devuelve el ID del usuario."""
     try:
         user_key = f"user:{usuario}"
-        if r.exists(user_key):
-            stored_password = r.hget(user_key, "contrasena").decode()
+        stored_password = r.hget(user_key, "contrasena")
+        if stored_password is not None:
             hashed_password = hash_password(contrasena)
-            if stored_password == hashed_password:
+            if stored_password.decode() == hashed_password:
                 print("¡Bienvenido a su recetario!")
                 return user_key
         print("¡Credenciales inválidas!")
@@ -44,15 +47,68 @@ def log_in(r, usuario, contrasena):
     except Exception as e:
         print(f"Error al iniciar sesión: {e}")
 
+def user_recipes_key(user_key):
+    """Devuelve la clave del conjunto con los IDs de las recetas de un usuario."""
+    return f"{user_key}:recipes"
+
+def ingredient_key(token):
+    """Devuelve la clave del conjunto con los IDs de las recetas que contienen un token."""
+    return f"ingredient:{token}"
+
+def ingredient_tokens(ingredientes):
+    """Normaliza una lista de ingredientes en el conjunto de palabras que se indexan."""
+    tokens = set()
+    for ingrediente in ingredientes:
+        tokens.update(ingrediente.strip().lower().split())
+    return tokens
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+def save_recipes(r, recipes, user_key):
+    """Guarda varias recetas de un usuario (y sus índices) en una sola transacción y devuelve sus IDs."""
+    recipe_ids = []
+    pipe = r.pipeline(transaction=True)
+    for recipe in recipes:
+        recipe_id = str(uuid.uuid4())
+        pipe.hset(f"recipe:{recipe_id}", mapping={
+            "receta": recipe["receta"],
+            "ingredientes": ",".join(recipe["ingredientes"]),
+            "pasos": ";".join(recipe["pasos"]),
+            "user_id": user_key,
+        })
+        for token in ingredient_tokens(recipe["ingredientes"]):
+            pipe.sadd(ingredient_key(token), recipe_id)
+        recipe_ids.append(recipe_id)
+    if recipe_ids:
+        pipe.sadd(user_recipes_key(user_key), *recipe_ids)
+        pipe.execute()
+    return recipe_ids
+
+def load_recipes(r, recipe_ids, fields=("receta", "ingredientes", "pasos", "user_id")):
+    """Carga varias recetas con un único pipeline de HMGET; omite las que ya no existen."""
+    recipe_ids = sorted(_decode(recipe_id) for recipe_id in recipe_ids)
+    pipe = r.pipeline(transaction=False)
+    for recipe_id in recipe_ids:
+        pipe.hmget(f"recipe:{recipe_id}", *fields)
+    recipes = []
+    for recipe_id, values in zip(recipe_ids, pipe.execute()):
+        if values[0] is None:
+            continue
+        recipe = {"id": recipe_id}
+        for field, value in zip(fields, values):
+            recipe[field] = _decode(value)
+        if recipe.get("ingredientes") is not None:
+            recipe["ingredientes"] = recipe["ingredientes"].split(",")
+        if recipe.get("pasos") is not None:
+            recipe["pasos"] = recipe["pasos"].split(";")
+        recipes.append(recipe)
+    return recipes
+
 def add_recipe(r, receta, ingredientes, pasos, user_key):
     """Agrega una nueva receta a la base de datos."""
     try:
-        recipe_id = str(uuid.uuid4())
-        recipe_key = f"recipe:{recipe_id}"
-        r.hset(recipe_key, "receta", receta)
-        r.hset(recipe_key, "ingredientes", ",".join(ingredientes))
-        r.hset(recipe_key, "pasos", ";".join(pasos))
-        r.hset(recipe_key, "user_id", user_key)
+        recipe_id = save_recipes(r, [{"receta": receta, "ingredientes": ingredientes, "pasos": pasos}], user_key)[0]
         print("¡Receta agregada con éxito!")
         return recipe_id  # Devolvemos el ID de la receta agregada
     except Exception as e:
@@ -63,13 +119,41 @@ def update_recipe(r, recipe_id, receta=None, ingredientes=None, pasos=None):
     """Modifica una receta existente en la base de datos."""
     try:
         recipe_key = f"recipe:{recipe_id}"
+        campos = {}
         if receta is not None:
-            r.hset(recipe_key, "receta", receta)
+            campos["receta"] = receta
         if ingredientes is not None:
-            r.hset(recipe_key, "ingredientes", ",".join(ingredientes))
+            campos["ingredientes"] = ",".join(ingredientes)
         if pasos is not None:
-            r.hset(recipe_key, "pasos", ";".join(pasos))
-        print("¡Receta modificada con éxito!")
+            campos["pasos"] = ";".join(pasos)
+        if not campos:
+            if r.exists(recipe_key):
+                print("¡Receta modificada con éxito!")
+            else:
+                print("No se encontró la receta con el ID proporcionado.")
+            return
+
+        def actualizar(pipe):
+            # WATCH sobre la receta: si otro cliente la cambia, la transacción se reintenta
+            if not pipe.exists(recipe_key):
+                # Sin MULTI no se escribe nada: ni un hash parcial ni entradas en los índices
+                return False
+            anteriores = pipe.hget(recipe_key, "ingredientes")
+            pipe.multi()
+            pipe.hset(recipe_key, mapping=campos)
+            if ingredientes is not None:
+                viejos = ingredient_tokens(_decode(anteriores).split(",")) if anteriores else set()
+                nuevos = ingredient_tokens(ingredientes)
+                for token in viejos - nuevos:
+                    pipe.srem(ingredient_key(token), recipe_id)
+                for token in nuevos - viejos:
+                    pipe.sadd(ingredient_key(token), recipe_id)
+            return True
+
+        if r.transaction(actualizar, recipe_key, value_from_callable=True):
+            print("¡Receta modificada con éxito!")
+        else:
+            print("No se encontró la receta con el ID proporcionado.")
     except Exception as e:
         print(f"Error al modificar receta: {e}")
 
@@ -77,7 +161,18 @@ def delete_recipe(r, recipe_id):
     """Elimina una receta de la base de datos."""
     try:
         recipe_key = f"recipe:{recipe_id}"
-        r.delete(recipe_key)
+
+        def eliminar(pipe):
+            user_id, ingredientes = pipe.hmget(recipe_key, "user_id", "ingredientes")
+            pipe.multi()
+            pipe.delete(recipe_key)
+            if user_id:
+                pipe.srem(user_recipes_key(_decode(user_id)), recipe_id)
+            if ingredientes:
+                for token in ingredient_tokens(_decode(ingredientes).split(",")):
+                    pipe.srem(ingredient_key(token), recipe_id)
+
+        r.transaction(eliminar, recipe_key)
         print("¡Receta eliminada con éxito!")
     except Exception as e:
         print(f"Error al eliminar receta: {e}")
@@ -85,19 +180,12 @@ def delete_recipe(r, recipe_id):
 def list_recipes(r, user_key):
     """Lista todas las recetas de un usuario específico."""
     try:
-        user_recipes_keys = r.keys("recipe:*")
-        user_recipes = []
-        for recipe_key in user_recipes_keys:
-            recipe_user_id = r.hget(recipe_key, "user_id").decode()
-            if recipe_user_id == user_key:
-                recipe_id = recipe_key.decode().split(":")[1]
-                recipe_name = r.hget(recipe_key, "receta").decode()
-                user_recipes.append({"id": recipe_id, "nombre": recipe_name})
+        user_recipes = load_recipes(r, r.smembers(user_recipes_key(user_key)), fields=("receta",))
 
         if user_recipes:
             print("Listado de recetas:")
             for recipe in user_recipes:
-                print(f"ID: {recipe['id']}\nReceta: {recipe['nombre']}")
+                print(f"ID: {recipe['id']}\nReceta: {recipe['receta']}")
         else:
             print("No hay recetas disponibles.")
     except Exception as e:
@@ -125,24 +213,63 @@ def view_recipe_details(r, recipe_id):
 def search_recipe_by_ingredient(r, ingrediente):
     """Busca recetas que contengan un ingrediente específico."""
     try:
-        found_recipes_keys = r.keys("recipe:*")
-        found_recipes = []
-        for recipe_key in found_recipes_keys:
-            recipe_ingredientes = r.hget(recipe_key, "ingredientes").decode()
-            if ingrediente in recipe_ingredientes:
-                recipe_id = recipe_key.decode().split(":")[1]
-                recipe_name = r.hget(recipe_key, "receta").decode()
-                found_recipes.append({"id": recipe_id, "nombre": recipe_name})
+        tokens = ingredient_tokens([ingrediente])
+        if tokens:
+            found_ids = r.sinter([ingredient_key(token) for token in tokens])
+        else:
+            found_ids = set()
+        found_recipes = load_recipes(r, found_ids, fields=("receta",))
 
         if found_recipes:
             print(f"Recetas que contienen '{ingrediente}':")
             for recipe in found_recipes:
-                print(f"ID: {recipe['id']}\nReceta: {recipe['nombre']}")
+                print(f"ID: {recipe['id']}\nReceta: {recipe['receta']}")
         else:
             print(f"No se encontraron recetas que contengan '{ingrediente}'.")
     except Exception as e:
         print(f"Error al buscar receta por ingrediente: {e}")
 
+def ensure_indexes(r):
+    """Reconstruye los índices una sola vez (las recetas guardadas antes de que existieran no aparecerían al listar o buscar)."""
+    if not r.exists(INDEXES_MIGRATED_KEY):
+        migrate_indexes(r)
+
+def migrate_indexes(r, batch_size=500):
+    """Reconstruye los índices por usuario e ingrediente a partir de los hashes 'recipe:*' existentes y deja la marca."""
+    try:
+        total = 0
+        batch = []
+        for recipe_key in r.scan_iter(match="recipe:*", count=batch_size):
+            batch.append(_decode(recipe_key))
+            if len(batch) >= batch_size:
+                total += _index_batch(r, batch)
+                batch = []
+        if batch:
+            total += _index_batch(r, batch)
+        r.set(INDEXES_MIGRATED_KEY, 1)
+        print(f"Índices reconstruidos para {total} recetas.")
+        return total
+    except Exception as e:
+        print(f"Error al migrar índices: {e}")
+        return 0
+
+def _index_batch(r, recipe_keys):
+    pipe = r.pipeline(transaction=False)
+    for recipe_key in recipe_keys:
+        pipe.hmget(recipe_key, "user_id", "ingredientes")
+    valores = pipe.execute()
+
+    pipe = r.pipeline(transaction=False)
+    for recipe_key, (user_id, ingredientes) in zip(recipe_keys, valores):
+        recipe_id = recipe_key.split(":", 1)[1]
+        if user_id:
+            pipe.sadd(user_recipes_key(_decode(user_id)), recipe_id)
+        if ingredientes:
+            for token in ingredient_tokens(_decode(ingredientes).split(",")):
+                pipe.sadd(ingredient_key(token), recipe_id)
+    pipe.execute()
+    return len(recipe_keys)
+
 def main():
     r = create_connection()
     if r is None:
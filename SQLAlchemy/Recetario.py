@@ -1,10 +1,28 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Index, Table, bindparam, insert, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, deferred, selectinload, undefer
 import hashlib
+import unicodedata
+
+# Recetas por página al listar
+PAGE_SIZE = 50
+# Recetas por lote al migrar los ingredientes
+MIGRATION_BATCH_SIZE = 500
+# Usuarios por INSERT al crearlos en bloque (3 parámetros por fila, por debajo del límite de SQLite)
+USER_BATCH_SIZE = 300
 
 Base = declarative_base()
 
+# Relación muchos a muchos entre recetas e ingredientes. La clave primaria (id_receta, id_ingrediente)
+# sirve para ir de una receta a sus ingredientes; el índice, para ir de un ingrediente a sus recetas.
+receta_ingrediente = Table(
+    'receta_ingrediente', Base.metadata,
+    Column('id_receta', Integer, ForeignKey('recetas.id', ondelete='CASCADE'), primary_key=True),
+    Column('id_ingrediente', Integer, ForeignKey('ingredientes.id', ondelete='CASCADE'), primary_key=True),
+    Index('ix_receta_ingrediente_id_ingrediente', 'id_ingrediente', 'id_receta'),
+)
+
 class Usuario(Base):
     __tablename__ = 'usuarios'
 
@@ -19,46 +37,164 @@ class Receta(Base):
 
     id = Column(Integer, primary_key=True)
     receta = Column(String, unique=True, nullable=False)
-    ingredientes = Column(String)
-    pasos = Column(String)
-    id_usuario = Column(Integer, ForeignKey('usuarios.id'))
+    # Los textos largos solo se cargan cuando se usan (o con undefer en las vistas de detalle)
+    ingredientes = deferred(Column(String))
+    pasos = deferred(Column(String))
+    id_usuario = Column(Integer, ForeignKey('usuarios.id'), index=True)
     usuario = relationship("Usuario", back_populates="recetas")
+    lista_ingredientes = relationship("Ingrediente", secondary=receta_ingrediente, back_populates="recetas")
+
+class Ingrediente(Base):
+    __tablename__ = 'ingredientes'
+
+    id = Column(Integer, primary_key=True)
+    # Nombre normalizado con normalize_ingredient; unique crea el índice usado en las búsquedas
+    nombre = Column(String, unique=True, nullable=False)
+    recetas = relationship("Receta", secondary=receta_ingrediente, back_populates="lista_ingredientes")
+
+# Consultas frecuentes construidas una sola vez con parámetros: cada llamada solo les pasa los
+# valores, sin volver a armar la consulta, y SQLAlchemy reutiliza el SQL compilado de su caché
+RECIPES_BY_USER = (select(Receta.id, Receta.receta)
+                   .where(Receta.id_usuario == bindparam('id_usuario'), Receta.id > bindparam('after_id'))
+                   .order_by(Receta.id)
+                   .limit(bindparam('page_size')))
+RECIPES_BY_INGREDIENT = (select(Receta.id, Receta.receta)
+                         .join(Receta.lista_ingredientes)
+                         .where(Ingrediente.nombre >= bindparam('nombre'), Ingrediente.nombre < bindparam('hasta'))
+                         .distinct()
+                         .order_by(Receta.id))
+USER_EXISTS = select(Usuario.id).where(Usuario.id == bindparam('id_usuario'))
+USER_BY_CREDENTIALS = select(Usuario.id).where(Usuario.usuario == bindparam('usuario'),
+                                               Usuario.contrasena == bindparam('contrasena'))
 
 def hash_password(password):
     """Hashea una contraseña utilizando el algoritmo SHA-256."""
     return hashlib.sha256(password.encode()).hexdigest()
 
+def normalize_ingredient(nombre):
+    """Normaliza el nombre de un ingrediente: minúsculas, sin acentos y con los espacios simplificados."""
+    nombre = unicodedata.normalize('NFKD', nombre.lower())
+    nombre = ''.join(c for c in nombre if not unicodedata.combining(c))
+    return ' '.join(nombre.split())
+
+def normalize_ingredients(ingredientes):
+    """Devuelve los nombres normalizados y sin repetir de una lista de ingredientes, en orden."""
+    nombres = (normalize_ingredient(ingrediente) for ingrediente in ingredientes)
+    return list(dict.fromkeys(nombre for nombre in nombres if nombre))
+
+def get_ingredients(session, nombres):
+    """Devuelve un diccionario nombre -> Ingrediente, creando los que todavía no existen."""
+    ingredientes = {}
+    nombres = list(nombres)
+    for i in range(0, len(nombres), MIGRATION_BATCH_SIZE):
+        lote = nombres[i:i + MIGRATION_BATCH_SIZE]
+        for ingrediente in session.query(Ingrediente).filter(Ingrediente.nombre.in_(lote)):
+            ingredientes[ingrediente.nombre] = ingrediente
+    for nombre in nombres:
+        if nombre not in ingredientes:
+            ingredientes[nombre] = Ingrediente(nombre=nombre)
+            session.add(ingredientes[nombre])
+    return ingredientes
+
+def create_indexes(engine):
+    """Crea los índices que faltan en tablas ya existentes (create_all solo los crea con la tabla)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+def migrate_ingredients(session, batch_size=MIGRATION_BATCH_SIZE):
+    """Rellena la tabla de ingredientes a partir del texto de las recetas que todavía no la usan.
+
+    Recorre las recetas por lotes de 'batch_size' y confirma cada lote, así que puede
+    interrumpirse y volver a ejecutarse. Devuelve la cantidad de recetas migradas.
+    """
+    migradas = 0
+    after_id = 0
+    try:
+        while True:
+            recetas = (session.query(Receta.id, Receta.ingredientes)
+                       .filter(Receta.id > after_id, ~Receta.lista_ingredientes.any())
+                       .order_by(Receta.id)
+                       .limit(batch_size)
+                       .all())
+            if not recetas:
+                break
+            nombres = {receta.id: normalize_ingredients((receta.ingredientes or '').split('\n'))
+                       for receta in recetas}
+            ingredientes = get_ingredients(session, dict.fromkeys(n for lista in nombres.values() for n in lista))
+            session.flush()
+            filas = [{'id_receta': id_receta, 'id_ingrediente': ingredientes[nombre].id}
+                     for id_receta, lista in nombres.items() for nombre in lista]
+            if filas:
+                session.execute(insert(receta_ingrediente), filas)
+            session.commit()
+            migradas += len(recetas)
+            after_id = recetas[-1].id
+    except Exception as e:
+        session.rollback()
+        print(f"Error al migrar los ingredientes: {e}")
+    if migradas:
+        print(f"Ingredientes migrados para {migradas} recetas.")
+    return migradas
+
 def create_connection():
     """Crea una conexión a la base de datos SQLite."""
     engine = create_engine('sqlite:///recetario.db')
     Base.metadata.create_all(engine)
+    create_indexes(engine)
     Session = sessionmaker(bind=engine)
-    return Session()
+    session = Session()
+    migrate_ingredients(session)
+    return session
 
 def create_user(session, usuario, contrasena, email):
-    """Crea un nuevo usuario en la base de datos."""
-    hashed_password = hash_password(contrasena)
-    existing_user = session.query(Usuario).filter(Usuario.usuario == usuario).first()
-    existing_email = session.query(Usuario).filter(Usuario.email == email).first()
-    
-    if existing_user:
-        print("El nombre de usuario ya está en uso. Por favor, elija otro.")
-    elif existing_email:
-        print("La dirección de correo electrónico ya está en uso. Por favor, proporcione otro.")
-    else:
-        new_user = Usuario(usuario=usuario, contrasena=hashed_password, email=email)
-        session.add(new_user)
+    """Crea un nuevo usuario en la base de datos y devuelve su ID (o None si ya existe)."""
+    # Se inserta directamente y las restricciones UNIQUE deciden: una sola ida y vuelta y sin
+    # carreras entre dos registros simultáneos con el mismo nombre o email
+    new_user = Usuario(usuario=usuario, contrasena=hash_password(contrasena), email=email)
+    session.add(new_user)
+    try:
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        if 'usuarios.email' in str(e.orig):
+            print("La dirección de correo electrónico ya está en uso. Por favor, proporcione otro.")
+        else:
+            print("El nombre de usuario ya está en uso. Por favor, elija otro.")
+        return None
+    print("¡Usuario creado con éxito!")
+    return new_user.id
+
+def create_users(session, usuarios, batch_size=USER_BATCH_SIZE):
+    """Crea usuarios en bloque a partir de tuplas (usuario, contrasena, email) en una sola transacción.
+
+    Usa un INSERT con varias filas por lote; los usuarios cuyo nombre o email ya existen se
+    omiten. Devuelve la cantidad de usuarios creados.
+    """
+    filas = [{'usuario': usuario, 'contrasena': hash_password(contrasena), 'email': email}
+             for usuario, contrasena, email in usuarios]
+    creados = 0
+    try:
+        for i in range(0, len(filas), batch_size):
+            resultado = session.execute(
+                insert(Usuario).prefix_with('OR IGNORE').values(filas[i:i + batch_size]))
+            creados += resultado.rowcount
         session.commit()
-        print("¡Usuario creado con éxito!")
+    except Exception as e:
+        session.rollback()
+        creados = 0
+        print(f"Error al crear los usuarios: {e}")
+    print(f"¡{creados} usuarios creados, {len(filas) - creados} omitidos!")
+    return creados
 
 def log_in(session, usuario, contrasena):
     """Verifica las credenciales de inicio de sesión y devuelve el ID del usuario."""
-    hashed_password = hash_password(contrasena)
-    user = session.query(Usuario).filter(Usuario.usuario == usuario, Usuario.contrasena == hashed_password).first()
+    user_id = session.execute(
+        USER_BY_CREDENTIALS, {'usuario': usuario, 'contrasena': hash_password(contrasena)}).scalar()
     
-    if user:
+    if user_id is not None:
         print("¡Bienvenido a su recetario!")
-        return user.id
+        return user_id
     else:
         print("¡Credenciales inválidas!")
         return None
@@ -68,13 +204,22 @@ def add_recipe(session, receta, ingredientes, pasos, id_usuario):
     ingredientes_str = '\n'.join(ingredientes)
     pasos_str = '\n'.join(pasos)
     new_recipe = Receta(receta=receta, ingredientes=ingredientes_str, pasos=pasos_str, id_usuario=id_usuario)
+    new_recipe.lista_ingredientes = list(get_ingredients(session, normalize_ingredients(ingredientes)).values())
     session.add(new_recipe)
     session.commit()
     print("¡Receta agregada con éxito!")
 
+def get_recipe(session, id_receta, *options):
+    """Devuelve la receta con ese ID (o None) con session.get: si ya está en la sesión no consulta la base."""
+    try:
+        id_receta = int(id_receta)
+    except (TypeError, ValueError):
+        return None
+    return session.get(Receta, id_receta, options=options)
+
 def update_recipe(session, id_receta, receta=None, ingredientes=None, pasos=None):
     """Modifica una receta existente en la base de datos."""
-    recipe = session.query(Receta).filter(Receta.id == id_receta).first()
+    recipe = get_recipe(session, id_receta)
     
     if recipe:
         if receta is not None:
@@ -82,6 +227,7 @@ def update_recipe(session, id_receta, receta=None, ingredientes=None, pasos=None
 
         if ingredientes is not None:
             recipe.ingredientes = '\n'.join(ingredientes)
+            recipe.lista_ingredientes = list(get_ingredients(session, normalize_ingredients(ingredientes)).values())
 
         if pasos is not None:
             recipe.pasos = '\n'.join(pasos)
@@ -93,7 +239,7 @@ def update_recipe(session, id_receta, receta=None, ingredientes=None, pasos=None
 
 def delete_recipe(session, id_receta):
     """Elimina una receta de la base de datos."""
-    recipe = session.query(Receta).filter(Receta.id == id_receta).first()
+    recipe = get_recipe(session, id_receta)
     
     if recipe:
         session.delete(recipe)
@@ -102,23 +248,47 @@ def delete_recipe(session, id_receta):
     else:
         print("No se encontró la receta con el ID proporcionado.")
 
-def list_recipes(session, id_usuario):
+def recipe_page(session, id_usuario, after_id=None, page_size=PAGE_SIZE):
+    """Devuelve una página de (id, receta) de un usuario y el ID desde el que pedir la siguiente.
+
+    Usa paginación por clave (id > after_id) y solo selecciona las columnas necesarias, así que
+    cada página es una consulta y ocupa lo mismo sin importar cuántas recetas haya.
+    """
+    recetas = session.execute(RECIPES_BY_USER, {
+        'id_usuario': id_usuario,
+        'after_id': after_id if after_id is not None else 0,
+        'page_size': page_size,
+    }).all()
+    next_id = recetas[-1].id if len(recetas) == page_size else None
+    return recetas, next_id
+
+def list_recipes(session, id_usuario, page_size=PAGE_SIZE):
     """Lista todas las recetas de un usuario específico."""
-    user = session.query(Usuario).get(id_usuario)
-    
-    if user:
-        if user.recetas:
-            print("Listado de recetas:")
-            for receta in user.recetas:
+    recetas, next_id = recipe_page(session, id_usuario, page_size=page_size)
+
+    if recetas:
+        print("Listado de recetas:")
+        while True:
+            for receta in recetas:
                 print(f"ID: {receta.id}\nReceta: {receta.receta}")
-        else:
-            print("No hay recetas disponibles para este usuario.")
+            if next_id is None:
+                break
+            recetas, next_id = recipe_page(session, id_usuario, next_id, page_size)
+    elif session.execute(USER_EXISTS, {'id_usuario': id_usuario}).first():
+        print("No hay recetas disponibles para este usuario.")
     else:
         print("No se encontró el usuario.")
 
+def load_user_with_recipes(session, id_usuario):
+    """Carga un usuario y el id y nombre de todas sus recetas en dos consultas (selectinload)."""
+    return (session.query(Usuario)
+            .options(selectinload(Usuario.recetas).load_only(Receta.id, Receta.receta))
+            .filter(Usuario.id == id_usuario)
+            .first())
+
 def view_recipe_details(session, id_receta):
     """Muestra los detalles de una receta específica."""
-    receta = session.query(Receta).filter(Receta.id == id_receta).first()
+    receta = get_recipe(session, id_receta, undefer(Receta.ingredientes), undefer(Receta.pasos))
 
     if receta:
         print("Detalles de la receta:")
@@ -132,7 +302,11 @@ def view_recipe_details(session, id_receta):
 
 def search_recipe_by_ingredient(session, ingrediente):
     """Busca recetas que contengan un ingrediente específico."""
-    recetas = session.query(Receta).filter(Receta.ingredientes.like(f'%{ingrediente}%')).all()
+    # Busca por prefijo del nombre normalizado ("harina" encuentra "harina de trigo") con un rango
+    # sobre el índice de ingredientes.nombre, en vez de recorrer el texto de todas las recetas
+    nombre = normalize_ingredient(ingrediente)
+    recetas = session.execute(
+        RECIPES_BY_INGREDIENT, {'nombre': nombre, 'hasta': nombre + '\U0010ffff'}).all() if nombre else []
     
     if recetas:
         print(f"Recetas que contienen '{ingrediente}':")
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, undefer
+
+import recetario_async
+from Recetario import Base, Receta, Usuario, migrate_ingredients, recipe_page
+
+# Prueba de carga de lecturas de recetas: cada "petición" pide la primera página de recetas de un
+# usuario y el detalle de una receta, como haría un front-end web.
+#  - sync: Recetario.py con un pool de hilos (un hilo y una sesión por petición en curso)
+#  - async: recetario_async.py con asyncio en un solo hilo y una sesión por petición
+# Uso: python benchmark_async.py [peticiones] [concurrencia]
+
+USUARIOS = 50
+RECETAS_POR_USUARIO = 200
+
+
+def preparar_base(ruta):
+    engine = create_engine(f"sqlite:///{ruta}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(Usuario.__table__.insert(), [
+            {'id': u, 'usuario': f"usuario{u}", 'contrasena': "x", 'email': f"usuario{u}@example.com"}
+            for u in range(1, USUARIOS + 1)])
+        conn.execute(Receta.__table__.insert(), [
+            {'receta': f"receta {i}", 'ingredientes': "harina\nhuevo\nleche", 'pasos': "mezclar\nhornear",
+             'id_usuario': i % USUARIOS + 1}
+            for i in range(USUARIOS * RECETAS_POR_USUARIO)])
+    with sessionmaker(bind=engine)() as session:
+        migrate_ingredients(session)
+    engine.dispose()
+
+
+def peticion_sync(Session, i):
+    with Session() as session:
+        recetas, _ = recipe_page(session, i % USUARIOS + 1)
+        receta = (session.query(Receta)
+                  .options(undefer(Receta.ingredientes), undefer(Receta.pasos))
+                  .filter(Receta.id == recetas[0].id)
+                  .first())
+        return receta.pasos
+
+
+def ejecutar_sync(ruta, peticiones, concurrencia):
+    engine = create_engine(f"sqlite:///{ruta}", pool_size=concurrencia)
+    Session = sessionmaker(bind=engine)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        list(executor.map(lambda i: peticion_sync(Session, i), range(peticiones)))
+    segundos = time.perf_counter() - inicio
+    engine.dispose()
+    return segundos
+
+
+async def peticion_async(Session, limite, i):
+    async with limite, Session() as session:
+        recetas, _ = await recetario_async.recipe_page(session, i % USUARIOS + 1)
+        receta = await recetario_async.view_recipe_details(session, recetas[0]['id'])
+        return receta['pasos']
+
+
+async def ejecutar_async(ruta, peticiones, concurrencia):
+    Session = await recetario_async.create_sessionmaker(f"sqlite+aiosqlite:///{ruta}")
+    limite = asyncio.Semaphore(concurrencia)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(peticion_async(Session, limite, i) for i in range(peticiones)))
+    segundos = time.perf_counter() - inicio
+    await Session.kw['bind'].dispose()
+    return segundos
+
+
+def main():
+    peticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrencia = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "recetario.db")
+        preparar_base(ruta)
+        print(f"{peticiones} peticiones, {concurrencia} en paralelo")
+        print(f"{'Modo':<8}{'peticiones/s':>14}")
+        segundos = ejecutar_sync(ruta, peticiones, concurrencia)
+        print(f"{'sync':<8}{peticiones / segundos:>14.0f}")
+        segundos = asyncio.run(ejecutar_async(ruta, peticiones, concurrencia))
+        print(f"{'async':<8}{peticiones / segundos:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
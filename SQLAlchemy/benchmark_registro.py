@@ -0,0 +1,98 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from Recetario import Base, Usuario, create_user, create_users, hash_password
+
+# Compara el registro de usuarios con N hilos, cada uno con su propia sesión:
+#  - antes: dos consultas (usuario y email) y después el INSERT; dos registros simultáneos
+#    con el mismo nombre pueden pasar la comprobación y fallar con IntegrityError
+#  - después: create_user, que inserta directamente y traduce el IntegrityError
+#  - en bloque: create_users con INSERT de varias filas
+# La mitad de los registros repite un nombre de usuario ya usado por otro hilo.
+# Uso: python benchmark_registro.py [hilos] [usuarios por hilo]
+
+
+def create_user_antes(session, usuario, contrasena, email):
+    """Versión anterior de create_user: comprueba con dos consultas y luego inserta."""
+    existing_user = session.query(Usuario).filter(Usuario.usuario == usuario).first()
+    existing_email = session.query(Usuario).filter(Usuario.email == email).first()
+    if existing_user or existing_email:
+        return None
+    new_user = Usuario(usuario=usuario, contrasena=hash_password(contrasena), email=email)
+    session.add(new_user)
+    session.commit()
+    return new_user.id
+
+
+def datos_usuario(hilo, i):
+    """Los hilos 2k y 2k+1 comparten los nombres de usuario de los registros pares."""
+    usuario = f"usuario_{hilo // 2}_{i}" if i % 2 == 0 else f"usuario_{hilo}_{i}_unico"
+    return usuario, "secreto", f"{usuario}_{hilo}@example.com"
+
+
+def registrar(funcion, Session, hilo, cantidad, resultados):
+    session = Session()
+    creados = rechazados = errores = 0
+    for i in range(cantidad):
+        try:
+            if funcion(session, *datos_usuario(hilo, i)) is None:
+                rechazados += 1
+            else:
+                creados += 1
+        except (IntegrityError, OperationalError):
+            session.rollback()
+            errores += 1
+    session.close()
+    resultados[hilo] = (creados, rechazados, errores)
+
+
+def ejecutar(nombre, funcion, hilos, cantidad):
+    with tempfile.TemporaryDirectory() as directorio:
+        engine = create_engine(f"sqlite:///{os.path.join(directorio, 'registro.db')}")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        resultados = {}
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if funcion is None:
+                session = Session()
+                creados = create_users(session, (datos_usuario(hilo, i)
+                                                 for hilo in range(hilos) for i in range(cantidad)))
+                session.close()
+                resultados[0] = (creados, hilos * cantidad - creados, 0)
+            else:
+                threads = [threading.Thread(target=registrar, args=(funcion, Session, hilo, cantidad, resultados))
+                           for hilo in range(hilos)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        segundos = time.perf_counter() - inicio
+        engine.dispose()
+    creados = sum(r[0] for r in resultados.values())
+    rechazados = sum(r[1] for r in resultados.values())
+    errores = sum(r[2] for r in resultados.values())
+    print(f"{nombre:<10}{hilos * cantidad / segundos:>14.0f}{creados:>10}{rechazados:>12}{errores:>16}")
+
+
+def main():
+    hilos = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    cantidad = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    print(f"{hilos} hilos x {cantidad} registros")
+    print(f"{'Modo':<10}{'registros/s':>14}{'creados':>10}{'rechazados':>12}{'errores (race)':>16}")
+    ejecutar("antes", create_user_antes, hilos, cantidad)
+    ejecutar("después", create_user, hilos, cantidad)
+    ejecutar("en bloque", None, hilos, cantidad)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import contextlib
+import io
+import sys
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.default import CACHE_HIT
+from sqlalchemy.orm import sessionmaker, undefer
+
+from Recetario import (Base, Ingrediente, Receta, create_users, get_recipe, migrate_ingredients,
+                       recipe_page, search_recipe_by_ingredient)
+
+# Mide cuánto tarda cada llamada en el ORM (armar la consulta, compilarla a SQL y procesar las filas)
+# y cuánto en la base de datos, y compara para las consultas frecuentes (por ID, por usuario y por
+# ingrediente) la versión que arma la consulta en cada llamada con las sentencias precompiladas y
+# session.get de Recetario.py.
+# Uso: python perfil_consultas.py [llamadas]
+
+USUARIOS = 20
+RECETAS_POR_USUARIO = 100
+
+
+class QueryProfiler:
+    """Acumula por nombre de operación las llamadas, el tiempo total, el tiempo en la base de datos y los aciertos de la caché de SQL compilado."""
+
+    def __init__(self, engine):
+        self.estadisticas = {}
+        self._actual = None
+        event.listen(engine, 'before_cursor_execute', self._antes_de_ejecutar)
+        event.listen(engine, 'after_cursor_execute', self._despues_de_ejecutar)
+
+    def _antes_de_ejecutar(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['inicio_consulta'] = time.perf_counter()
+
+    def _despues_de_ejecutar(self, conn, cursor, statement, parameters, context, executemany):
+        duracion = time.perf_counter() - conn.info.pop('inicio_consulta')
+        if self._actual is not None:
+            self._actual['db'] += duracion
+            self._actual['consultas'] += 1
+            self._actual['cache'] += context.cache_hit is CACHE_HIT
+
+    @contextmanager
+    def medir(self, nombre):
+        """Mide una llamada y suma sus tiempos a los de 'nombre'."""
+        datos = self.estadisticas.setdefault(nombre, {'llamadas': 0, 'total': 0.0, 'db': 0.0, 'consultas': 0, 'cache': 0})
+        self._actual = datos
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            datos['total'] += time.perf_counter() - inicio
+            datos['llamadas'] += 1
+            self._actual = None
+
+    def reporte(self):
+        """Imprime por operación el tiempo medio por llamada en el ORM y en la base de datos (en µs)."""
+        print(f"{'Operación':<34}{'ORM µs':>10}{'DB µs':>10}{'consultas':>11}{'caché SQL':>11}")
+        for nombre, datos in self.estadisticas.items():
+            llamadas = datos['llamadas']
+            orm = (datos['total'] - datos['db']) / llamadas * 1e6
+            db = datos['db'] / llamadas * 1e6
+            cache = f"{datos['cache'] / datos['consultas']:.0%}" if datos['consultas'] else "-"
+            print(f"{nombre:<34}{orm:>10.1f}{db:>10.1f}{datos['consultas'] / llamadas:>11.2f}{cache:>11}")
+
+
+def preparar_base(Session):
+    with Session() as session, contextlib.redirect_stdout(io.StringIO()):
+        create_users(session, ((f"usuario{u}", "x", f"usuario{u}@example.com") for u in range(USUARIOS)))
+        session.add_all(Receta(receta=f"receta {i}", ingredientes=f"harina\nhuevo\ningrediente {i % 50}",
+                               pasos="mezclar\nhornear", id_usuario=i % USUARIOS + 1)
+                        for i in range(USUARIOS * RECETAS_POR_USUARIO))
+        session.commit()
+        migrate_ingredients(session)
+
+
+def perfilar(session, perfil, llamadas):
+    for i in range(llamadas):
+        id_receta = i % (USUARIOS * RECETAS_POR_USUARIO) + 1
+        id_usuario = i % USUARIOS + 1
+        nombre = f"ingrediente {i % 50}"
+
+        session.expunge_all()
+        with perfil.medir("por ID, consulta rearmada"):
+            (session.query(Receta)
+             .options(undefer(Receta.ingredientes), undefer(Receta.pasos))
+             .filter(Receta.id == id_receta)
+             .first())
+        session.expunge_all()
+        with perfil.medir("por ID, session.get"):
+            receta = get_recipe(session, id_receta, undefer(Receta.ingredientes), undefer(Receta.pasos))
+        # La receta sigue referenciada y en la sesión: session.get la toma del identity map
+        with perfil.medir("por ID, session.get ya cargada"):
+            get_recipe(session, receta.id, undefer(Receta.ingredientes), undefer(Receta.pasos))
+
+        with perfil.medir("por usuario, consulta rearmada"):
+            (session.query(Receta.id, Receta.receta)
+             .filter(Receta.id_usuario == id_usuario)
+             .order_by(Receta.id)
+             .limit(50)
+             .all())
+        with perfil.medir("por usuario, precompilada"):
+            recipe_page(session, id_usuario)
+
+        with perfil.medir("por ingrediente, consulta rearmada"):
+            (session.query(Receta.id, Receta.receta)
+             .join(Receta.lista_ingredientes)
+             .filter(Ingrediente.nombre >= nombre, Ingrediente.nombre < nombre + '\U0010ffff')
+             .distinct()
+             .order_by(Receta.id)
+             .all())
+        with perfil.medir("por ingrediente, precompilada"), contextlib.redirect_stdout(io.StringIO()):
+            search_recipe_by_ingredient(session, nombre)
+
+
+def main():
+    llamadas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for titulo, opciones in (("Con la caché de SQL compilado de SQLAlchemy", {}),
+                             ("Sin caché de SQL compilado (query_cache_size=0)", {'query_cache_size': 0})):
+        engine = create_engine("sqlite://", **opciones)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        preparar_base(Session)
+        perfil = QueryProfiler(engine)
+        with Session() as session:
+            perfilar(session, perfil, llamadas)
+        print(f"\n{titulo}, {llamadas} llamadas por operación")
+        perfil.reporte()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload, undefer
+
+from Recetario import (Base, Ingrediente, PAGE_SIZE, RECIPES_BY_INGREDIENT, RECIPES_BY_USER, Receta,
+                       USER_BATCH_SIZE, USER_BY_CREDENTIALS, USER_EXISTS, Usuario, create_indexes, hash_password,
+                       migrate_ingredients, normalize_ingredient, normalize_ingredients, receta_ingrediente)
+
+# Versión asyncio de Recetario.py (AsyncSession sobre aiosqlite) para servir muchas lecturas
+# concurrentes sin un hilo por petición. Las funciones tienen los mismos parámetros que las de
+# Recetario.py pero devuelven los datos en vez de imprimirlos.
+# Uso desde un servidor asíncrono:
+#     Session = await create_sessionmaker()
+#     async with Session() as session:
+#         recetas = await list_recipes(session, id_usuario)
+
+DATABASE_URL = 'sqlite+aiosqlite:///recetario.db'
+
+
+def _recipe_summary(receta):
+    return {'id': receta.id, 'receta': receta.receta}
+
+
+async def create_sessionmaker(url=DATABASE_URL):
+    """Crea las tablas, índices e ingredientes que falten y devuelve una fábrica de sesiones asíncronas."""
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_indexes)
+    # expire_on_commit=False: los objetos se pueden seguir leyendo después del commit sin otra consulta
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with Session() as session:
+        await session.run_sync(migrate_ingredients)
+    return Session
+
+
+async def create_connection():
+    """Crea una sesión asíncrona sobre la base de datos SQLite."""
+    Session = await create_sessionmaker()
+    return Session()
+
+
+async def get_ingredients(session, nombres):
+    """Devuelve un diccionario nombre -> Ingrediente, creando los que todavía no existen."""
+    nombres = list(nombres)
+    ingredientes = {}
+    if nombres:
+        resultado = await session.scalars(select(Ingrediente).where(Ingrediente.nombre.in_(nombres)))
+        ingredientes = {ingrediente.nombre: ingrediente for ingrediente in resultado}
+    for nombre in nombres:
+        if nombre not in ingredientes:
+            ingredientes[nombre] = Ingrediente(nombre=nombre)
+            session.add(ingredientes[nombre])
+    return ingredientes
+
+
+async def create_user(session, usuario, contrasena, email):
+    """Crea un nuevo usuario y devuelve su ID, o None si el nombre o el email ya están en uso."""
+    new_user = Usuario(usuario=usuario, contrasena=hash_password(contrasena), email=email)
+    session.add(new_user)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        return None
+    return new_user.id
+
+
+async def create_users(session, usuarios, batch_size=USER_BATCH_SIZE):
+    """Crea usuarios en bloque a partir de tuplas (usuario, contrasena, email) y devuelve cuántos se crearon."""
+    filas = [{'usuario': usuario, 'contrasena': hash_password(contrasena), 'email': email}
+             for usuario, contrasena, email in usuarios]
+    creados = 0
+    try:
+        for i in range(0, len(filas), batch_size):
+            resultado = await session.execute(
+                insert(Usuario).prefix_with('OR IGNORE').values(filas[i:i + batch_size]))
+            creados += resultado.rowcount
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    return creados
+
+
+async def log_in(session, usuario, contrasena):
+    """Devuelve el ID del usuario si las credenciales son válidas, o None."""
+    return await session.scalar(USER_BY_CREDENTIALS, {'usuario': usuario, 'contrasena': hash_password(contrasena)})
+
+
+async def add_recipe(session, receta, ingredientes, pasos, id_usuario):
+    """Agrega una nueva receta y devuelve su ID."""
+    new_recipe = Receta(receta=receta, ingredientes='\n'.join(ingredientes), pasos='\n'.join(pasos),
+                        id_usuario=id_usuario)
+    new_recipe.lista_ingredientes = list((await get_ingredients(session, normalize_ingredients(ingredientes))).values())
+    session.add(new_recipe)
+    await session.commit()
+    return new_recipe.id
+
+
+async def get_recipe(session, id_receta, *options):
+    """Devuelve la receta con ese ID (o None, también si el ID no es un número) con session.get."""
+    try:
+        id_receta = int(id_receta)
+    except (TypeError, ValueError):
+        return None
+    return await session.get(Receta, id_receta, options=options)
+
+
+async def update_recipe(session, id_receta, receta=None, ingredientes=None, pasos=None):
+    """Modifica una receta existente. Devuelve False si no existe."""
+    recipe = await get_recipe(session, id_receta, selectinload(Receta.lista_ingredientes))
+    if recipe is None:
+        return False
+    if receta is not None:
+        recipe.receta = receta
+    if ingredientes is not None:
+        recipe.ingredientes = '\n'.join(ingredientes)
+        recipe.lista_ingredientes = list(
+            (await get_ingredients(session, normalize_ingredients(ingredientes))).values())
+    if pasos is not None:
+        recipe.pasos = '\n'.join(pasos)
+    await session.commit()
+    return True
+
+
+async def delete_recipe(session, id_receta):
+    """Elimina una receta. Devuelve False si no existe."""
+    try:
+        id_receta = int(id_receta)
+    except (TypeError, ValueError):
+        return False
+    await session.execute(delete(receta_ingrediente).where(receta_ingrediente.c.id_receta == id_receta))
+    resultado = await session.execute(delete(Receta).where(Receta.id == id_receta))
+    await session.commit()
+    return resultado.rowcount > 0
+
+
+async def recipe_page(session, id_usuario, after_id=None, page_size=PAGE_SIZE):
+    """Devuelve una página de recetas ({'id', 'receta'}) de un usuario y el ID desde el que pedir la siguiente."""
+    recetas = (await session.execute(RECIPES_BY_USER, {
+        'id_usuario': id_usuario,
+        'after_id': after_id if after_id is not None else 0,
+        'page_size': page_size,
+    })).all()
+    next_id = recetas[-1].id if len(recetas) == page_size else None
+    return [_recipe_summary(receta) for receta in recetas], next_id
+
+
+async def list_recipes(session, id_usuario, page_size=PAGE_SIZE):
+    """Devuelve todas las recetas ({'id', 'receta'}) de un usuario, o None si el usuario no existe."""
+    recetas, next_id = await recipe_page(session, id_usuario, page_size=page_size)
+    if not recetas:
+        usuario_existe = await session.scalar(USER_EXISTS, {'id_usuario': id_usuario})
+        return [] if usuario_existe is not None else None
+    while next_id is not None:
+        pagina, next_id = await recipe_page(session, id_usuario, next_id, page_size)
+        recetas.extend(pagina)
+    return recetas
+
+
+async def load_user_with_recipes(session, id_usuario):
+    """Carga un usuario y el id y nombre de todas sus recetas en dos consultas (selectinload)."""
+    return await session.scalar(
+        select(Usuario)
+        .options(selectinload(Usuario.recetas).load_only(Receta.id, Receta.receta))
+        .where(Usuario.id == id_usuario))
+
+
+async def view_recipe_details(session, id_receta):
+    """Devuelve los detalles de una receta ({'id', 'receta', 'ingredientes', 'pasos'}), o None."""
+    receta = await get_recipe(session, id_receta, undefer(Receta.ingredientes), undefer(Receta.pasos))
+    if receta is None:
+        return None
+    return {
+        'id': receta.id,
+        'receta': receta.receta,
+        'ingredientes': receta.ingredientes.split('\n') if receta.ingredientes else [],
+        'pasos': receta.pasos.split('\n') if receta.pasos else [],
+    }
+
+
+async def search_recipe_by_ingredient(session, ingrediente):
+    """Devuelve las recetas ({'id', 'receta'}) con un ingrediente que empiece por el nombre buscado."""
+    nombre = normalize_ingredient(ingrediente)
+    if not nombre:
+        return []
+    recetas = await session.execute(RECIPES_BY_INGREDIENT, {'nombre': nombre, 'hasta': nombre + '\U0010ffff'})
+    return [_recipe_summary(receta) for receta in recetas]
@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# Agregados precalculados de los indicadores de vacunación. Se calculan una sola vez con
+# operaciones vectorizadas sobre la tabla ancha (una columna por año) y se guardan ya
+# serializados, para que el panel no tenga que descargar todos los datos y agregarlos.
+
+PERCENTILES = [0.1, 0.25, 0.75, 0.9]
+AGRUPACIONES = {'region': 'Region', 'income': 'IncomeGroup'}
+
+
+def _lista(valores):
+    """Convierte una serie o arreglo numérico en una lista JSON (NaN pasa a None)."""
+    return [None if np.isnan(valor) else round(float(valor), 4) for valor in np.asarray(valores, dtype=float)]
+
+
+def _columna(nombre, valores):
+    """Serializa una estadística; los conteos se envían como enteros."""
+    if nombre == 'paises_con_dato':
+        return [int(valor) for valor in valores]
+    return _lista(valores)
+
+
+def _estadisticas(grupos):
+    """Calcula, por grupo y año, las estadísticas entre países; devuelve un dict nombre -> DataFrame."""
+    resultado = {
+        'media': grupos.mean(),
+        'mediana': grupos.median(),
+        'minimo': grupos.min(),
+        'maximo': grupos.max(),
+    }
+    for q in PERCENTILES:
+        resultado[f"p{int(q * 100)}"] = grupos.quantile(q)
+    resultado['paises_con_dato'] = grupos.count()
+    return resultado
+
+
+def series_por_pais(ancho):
+    """Serie temporal de cada indicador para cada país, indexada por código y por nombre de país."""
+    anios = list(ancho.columns)
+    series = {}
+    for codigo, filas in ancho.groupby(level='Country Code', sort=False):
+        nombre = filas.index.get_level_values('Country Name')[0]
+        cuerpo = json.dumps({
+            'pais': nombre,
+            'codigo': codigo,
+            'anios': anios,
+            'indicadores': {
+                idx[3]: {'nombre': idx[2], 'valores': _lista(valores)}
+                for idx, valores in zip(filas.index, filas.to_numpy())
+            }
+        }, ensure_ascii=False)
+        series[codigo] = cuerpo
+        series[nombre] = cuerpo
+    return series
+
+
+def estadisticas_por_anio(ancho, paises):
+    """Estadísticas entre países (sin agregados regionales) por indicador y año."""
+    solo_paises = ancho[_es_pais(ancho, paises)]
+    grupos = solo_paises.groupby(level='Indicator Code', sort=False)
+    estadisticas = _estadisticas(grupos)
+    total = grupos.size()
+    anios = list(ancho.columns)
+    resultado = {}
+    for indicador in total.index:
+        cuerpo = {'indicador': indicador, 'anios': anios, 'paises': int(total[indicador])}
+        for nombre, tabla in estadisticas.items():
+            cuerpo[nombre] = _columna(nombre, tabla.loc[indicador])
+        resultado[indicador] = json.dumps(cuerpo, ensure_ascii=False)
+    return resultado
+
+
+def agregados_por_grupo(ancho, paises, columna):
+    """Estadísticas por indicador, año y grupo de países (región o grupo de ingresos)."""
+    codigos = ancho.index.get_level_values('Country Code')
+    grupo_de_fila = paises[columna].reindex(codigos).to_numpy()
+    con_grupo = pd.notna(grupo_de_fila)
+    datos = ancho[con_grupo]
+    grupos = datos.groupby([datos.index.get_level_values('Indicator Code'), grupo_de_fila[con_grupo]], sort=True)
+    estadisticas = _estadisticas(grupos)
+    anios = list(ancho.columns)
+    resultado = {}
+    for indicador, nombre_grupo in estadisticas['media'].index:
+        cuerpo = resultado.setdefault(indicador, {'indicador': indicador, 'anios': anios, 'grupos': {}})
+        cuerpo['grupos'][nombre_grupo] = {nombre: _columna(nombre, tabla.loc[(indicador, nombre_grupo)])
+                                          for nombre, tabla in estadisticas.items()}
+    return {indicador: json.dumps(cuerpo, ensure_ascii=False) for indicador, cuerpo in resultado.items()}
+
+
+def _es_pais(ancho, paises):
+    """Máscara de las filas que son países (tienen región), excluyendo agregados como 'World'."""
+    codigos = ancho.index.get_level_values('Country Code')
+    return paises['Region'].reindex(codigos).notna().to_numpy()
+
+
+def calcular(ancho, paises):
+    """Calcula todos los agregados; el resultado se guarda en memoria durante la vida del proceso."""
+    return {
+        'series': series_por_pais(ancho),
+        'estadisticas': estadisticas_por_anio(ancho, paises),
+        'grupos': {nombre: agregados_por_grupo(ancho, paises, columna)
+                   for nombre, columna in AGRUPACIONES.items()},
+        # Permite pedir un indicador por código o por nombre
+        'indicadores': {**{codigo: codigo for _, _, _, codigo in ancho.index},
+                        **{nombre: codigo for _, _, nombre, codigo in ancho.index}},
+    }
@@ -0,0 +1,75 @@
+import json
+import time
+
+import pandas as pd
+
+from cache_datos import a_formato_largo, cargar
+from main import ARCHIVO_DATOS, a_json
+
+# Compara la conversión antigua (iterrows fila por fila) con la vectorizada de main.py.
+# Uso: python benchmark.py  (desde la carpeta parcial2)
+
+
+def formato_antiguo(ancho):
+    """Conversión original: un dict de Python por cada (fila, año)."""
+    datos_formateados = []
+    for idx, fila in ancho.iterrows():
+        for anio, valor in zip(ancho.columns, fila):
+            if pd.isna(valor):
+                valor = None
+            datos_formateados.append({
+                'Country Name': idx[0],
+                'Country Code': idx[1],
+                'Indicator Name': idx[2],
+                'Indicator Code': idx[3],
+                'Year': anio,
+                'Value': valor
+            })
+    return datos_formateados
+
+
+def json_antiguo(ancho):
+    return json.dumps(formato_antiguo(ancho))
+
+
+def json_nuevo(ancho):
+    """Tabla larga serializada directamente desde sus columnas."""
+    return a_json(a_formato_largo(ancho))
+
+
+def hoja_sintetica(ancho, factor):
+    """Repite la hoja 'factor' veces con códigos de país distintos para simular un archivo más grande."""
+    copias = []
+    for i in range(factor):
+        copia = ancho.copy()
+        copia.index = copia.index.set_levels(
+            [codigo + str(i) for codigo in copia.index.levels[1]], level=1)
+        copias.append(copia)
+    return pd.concat(copias)
+
+
+def medir(funcion, ancho, repeticiones=3):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(ancho)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    df = cargar(ARCHIVO_DATOS)[0]
+    hojas = [('vacunacion.xls', df), ('sintética x100', hoja_sintetica(df, 100))]
+    pruebas = [('conversión', formato_antiguo, a_formato_largo), ('conversión + JSON', json_antiguo, json_nuevo)]
+    print(f"{'Hoja':<16}{'Registros':>11}  {'Prueba':<19}{'iterrows (s)':>13}{'vectorizado (s)':>17}{'Mejora':>9}")
+    for nombre, ancho in hojas:
+        repeticiones = 3 if len(ancho) < 10000 else 1
+        registros = ancho.shape[0] * ancho.shape[1]
+        for prueba, antigua, nueva in pruebas:
+            antiguo = medir(antigua, ancho, repeticiones)
+            nuevo = medir(nueva, ancho, repeticiones)
+            print(f"{nombre:<16}{registros:>11}  {prueba:<19}{antiguo:>13.3f}{nuevo:>17.3f}{antiguo / nuevo:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Caché binaria de vacunacion.xls: la hoja se analiza una sola vez y se guarda como
+# una matriz .npy (una fila por país/indicador, una columna por año) que cada worker
+# abre con mmap, de modo que todos comparten las mismas páginas en memoria.
+# Uso: python cache_datos.py [archivo.xls]  (para generar la caché antes de iniciar Gunicorn)
+
+DIRECTORIO_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+COLUMNAS_ID = ['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code']
+
+# Se incrementa cuando cambia el contenido de la caché, para regenerarla aunque el .xls sea el mismo
+VERSION_CACHE = 2
+
+
+def a_formato_largo(ancho):
+    """Convierte la tabla ancha (una columna por año) en una tabla larga con un registro por (fila, año).
+
+    Las columnas de texto son categóricas (un código pequeño por registro) y 'Value' es la matriz
+    de valores aplanada; si la matriz ya es contigua, como la de la caché, no se copia.
+    """
+    n_filas, n_anios = ancho.shape
+    columnas = {}
+    for nivel, nombre in enumerate(COLUMNAS_ID):
+        codigos, categorias = pd.factorize(ancho.index.get_level_values(nivel))
+        columnas[nombre] = pd.Categorical.from_codes(np.repeat(codigos, n_anios), categories=categorias)
+    anios = [str(anio) for anio in ancho.columns]
+    columnas['Year'] = pd.Categorical.from_codes(np.tile(np.arange(n_anios), n_filas), categories=anios)
+    columnas['Value'] = ancho.to_numpy(dtype=float).reshape(-1)
+    return pd.DataFrame(columnas, copy=False)
+
+
+def huella(ruta):
+    """Calcula el hash SHA-256 del archivo de origen, que identifica su caché."""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def convertir(ruta, destino):
+    """Lee la hoja 'Data' del .xls y escribe la caché en 'destino' de forma atómica."""
+    ancho = pd.read_excel(ruta, sheet_name='Data', header=3, index_col=[0, 1, 2, 3])
+    # Región y grupo de ingresos por país (los agregados regionales del Banco Mundial no tienen región)
+    paises = pd.read_excel(ruta, sheet_name='Metadata - Countries', index_col='Country Code',
+                           usecols=['Country Code', 'Region', 'IncomeGroup'])
+    paises = paises.astype(object).where(paises.notna(), None)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporal = tempfile.mkdtemp(dir=os.path.dirname(destino))
+    try:
+        np.save(os.path.join(temporal, 'valores.npy'), np.ascontiguousarray(ancho.to_numpy(dtype=float)))
+        with open(os.path.join(temporal, 'etiquetas.json'), 'w', encoding='utf-8') as archivo:
+            json.dump({'indice': [list(idx) for idx in ancho.index], 'anios': [str(a) for a in ancho.columns],
+                       'paises': {codigo: list(fila) for codigo, fila in paises.iterrows()}},
+                      archivo, ensure_ascii=False)
+        os.rename(temporal, destino)
+    except OSError:
+        shutil.rmtree(temporal, ignore_errors=True)
+        # Otro worker pudo haber generado la misma caché al mismo tiempo
+        if not os.path.isdir(destino):
+            raise
+
+
+def limpiar(vigente):
+    """Elimina las cachés de versiones anteriores del archivo de origen."""
+    for nombre in os.listdir(DIRECTORIO_CACHE):
+        ruta = os.path.join(DIRECTORIO_CACHE, nombre)
+        if ruta != vigente and os.path.isdir(ruta) and not nombre.startswith('tmp'):
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+def cargar(ruta):
+    """Devuelve (ancho, largo, paises) a partir de la caché del archivo, generándola si no existe o está desactualizada.
+
+    'ancho' tiene una columna por año y 'largo' un registro por (fila, año); los valores de ambos
+    son vistas de la misma matriz mapeada en memoria. 'paises' tiene la región y el grupo de
+    ingresos de cada código de país.
+    """
+    destino = os.path.join(DIRECTORIO_CACHE, f"{huella(ruta)}-v{VERSION_CACHE}")
+    if not os.path.isdir(destino):
+        convertir(ruta, destino)
+        limpiar(destino)
+
+    valores = np.load(os.path.join(destino, 'valores.npy'), mmap_mode='r')
+    with open(os.path.join(destino, 'etiquetas.json'), encoding='utf-8') as archivo:
+        etiquetas = json.load(archivo)
+
+    indice = pd.MultiIndex.from_tuples([tuple(idx) for idx in etiquetas['indice']], names=COLUMNAS_ID)
+    ancho = pd.DataFrame(valores, index=indice, columns=etiquetas['anios'], copy=False)
+    paises = pd.DataFrame.from_dict(etiquetas['paises'], orient='index', columns=['Region', 'IncomeGroup'])
+    paises.index.name = 'Country Code'
+    return ancho, a_formato_largo(ancho), paises
+
+
+if __name__ == '__main__':
+    origen = sys.argv[1] if len(sys.argv) > 1 else 'vacunacion.xls'
+    ancho = cargar(origen)[0]
+    print(f"Caché lista para {origen}: {ancho.shape[0]} filas x {ancho.shape[1]} años en {DIRECTORIO_CACHE}")
@@ -1,10 +1,169 @@
-from flask import Flask, jsonify, render_template
-import pandas as pd
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
+from functools import lru_cache
+import gzip
+import hashlib
+import os
+import numpy as np
+
+import agregados
+from cache_datos import cargar, huella
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se ofrece gzip
+    brotli = None
 
 app = Flask(__name__)
 
-# Lectura del archivo .xls
-df = pd.read_excel('vacunacion.xls', sheet_name='Data', header=3, index_col=[0, 1, 2, 3])
+ARCHIVO_DATOS = 'vacunacion.xls'
+
+# Tamaño de página por defecto y máximo para /datos
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+# Columnas por las que /datos puede ordenar (?sort=)
+COLUMNAS_ORDENABLES = ['Country Name', 'Country Code', 'Indicator Name', 'Indicator Code', 'Year', 'Value']
+
+# Filas por bloque al enviar datos en modo streaming
+FILAS_POR_BLOQUE = 5000
+
+# Los datos solo cambian al reemplazar el .xls (y reiniciar), así que el navegador puede
+# reutilizarlos y luego revalidarlos con el ETag
+CACHE_CONTROL = 'public, max-age=3600'
+
+# Calidad 5 comprime casi igual que 9-10 en una fracción del tiempo; 11 tarda segundos con /todos_los_datos
+CALIDAD_BROTLI = 5
+
+# Cuerpos ya serializados y comprimidos: {clave: {codificación: bytes}}
+cuerpos_comprimidos = {}
+
+
+@lru_cache(maxsize=None)
+def tablas():
+    """Devuelve (ancho, largo, paises), cargados desde la caché binaria la primera vez que se necesitan en cada proceso."""
+    return cargar(ARCHIVO_DATOS)
+
+
+@lru_cache(maxsize=None)
+def obtener_agregados():
+    """Agregados precalculados a partir de las tablas, una sola vez por proceso."""
+    ancho, _, paises = tablas()
+    return agregados.calcular(ancho, paises)
+
+
+@lru_cache(maxsize=None)
+def huella_datos():
+    """Hash y fecha de modificación del archivo de datos, base de los ETag y de Last-Modified."""
+    return huella(ARCHIVO_DATOS), os.path.getmtime(ARCHIVO_DATOS)
+
+
+def _codificaciones(clave, generar):
+    """Devuelve el cuerpo de 'clave' sin comprimir y comprimido, generándolo y comprimiéndolo solo la primera vez."""
+    cuerpos = cuerpos_comprimidos.get(clave)
+    if cuerpos is None:
+        datos = generar().encode('utf-8')
+        cuerpos = {'identity': datos, 'gzip': gzip.compress(datos, compresslevel=9)}
+        if brotli is not None:
+            cuerpos['br'] = brotli.compress(datos, quality=CALIDAD_BROTLI, mode=brotli.MODE_TEXT)
+        cuerpos_comprimidos[clave] = cuerpos
+    return cuerpos
+
+
+def respuesta_cacheable(clave, generar):
+    """Respuesta JSON de datos inmutables con ETag, Last-Modified, Cache-Control y cuerpo precomprimido.
+
+    'clave' identifica el contenido (no la URL, para que parámetros ajenos no llenen la memoria) y
+    'generar' solo se llama si ese cuerpo aún no está en memoria. Las peticiones condicionales que
+    coinciden reciben un 304 sin cuerpo.
+    """
+    cuerpos = _codificaciones(clave, generar)
+    codificacion = request.accept_encodings.best_match([c for c in ('br', 'gzip') if c in cuerpos]) or 'identity'
+
+    hash_datos, modificado = huella_datos()
+    etag = f"{hash_datos[:16]}-{hashlib.sha1(clave.encode('utf-8')).hexdigest()[:8]}"
+    if codificacion != 'identity':
+        etag += f"-{codificacion}"
+
+    respuesta = Response(cuerpos[codificacion], mimetype='application/json')
+    if codificacion != 'identity':
+        respuesta.content_encoding = codificacion
+    respuesta.vary.add('Accept-Encoding')
+    respuesta.set_etag(etag)
+    respuesta.last_modified = modificado
+    respuesta.headers['Cache-Control'] = CACHE_CONTROL
+    return respuesta.make_conditional(request)
+
+
+def _indicador(calculados):
+    """Código del indicador pedido en ?indicator= (código o nombre); por defecto, el primero de la hoja."""
+    indicador = request.args.get('indicator')
+    if not indicador:
+        return next(iter(calculados['indicadores'].values()))
+    return calculados['indicadores'].get(indicador)
+
+
+def a_json(datos):
+    """Serializa la tabla larga como lista JSON directamente desde sus columnas (NaN se convierte en null)."""
+    return datos.to_json(orient='records')
+
+
+def filtrar_datos(pais=None, indicador=None, anio_desde=None, anio_hasta=None, busqueda=None,
+                  orden=None, descendente=False):
+    """Devuelve las posiciones (en la tabla larga) de los registros que cumplen los filtros, en el orden pedido.
+
+    País e indicador se filtran por nombre o código exactos; 'busqueda' es un texto que debe aparecer
+    en el nombre o el código del país, sin distinguir mayúsculas.
+    """
+    datos_largos = tablas()[1]
+    mascara = np.ones(len(datos_largos), dtype=bool)
+    if pais:
+        mascara &= (datos_largos['Country Name'] == pais) | (datos_largos['Country Code'] == pais)
+    if indicador:
+        mascara &= (datos_largos['Indicator Name'] == indicador) | (datos_largos['Indicator Code'] == indicador)
+    if busqueda:
+        # Se compara el texto solo contra las categorías (un valor por país), no contra cada registro
+        coincide = np.zeros(len(datos_largos), dtype=bool)
+        for columna in ('Country Name', 'Country Code'):
+            categorias = datos_largos[columna].cat.categories
+            coincide |= datos_largos[columna].isin(categorias[categorias.str.contains(busqueda, case=False, regex=False)])
+        mascara &= coincide
+    if anio_desde is not None or anio_hasta is not None:
+        anios = [anio for anio in datos_largos['Year'].cat.categories
+                 if (anio_desde is None or int(anio) >= anio_desde)
+                 and (anio_hasta is None or int(anio) <= anio_hasta)]
+        mascara &= datos_largos['Year'].isin(anios)
+    if orden is None:
+        return np.flatnonzero(mascara)
+    permutacion = orden_por(orden, descendente)
+    return permutacion[mascara[permutacion]]
+
+
+@lru_cache(maxsize=None)
+def orden_por(columna, descendente):
+    """Permutación de la tabla larga ordenada por 'columna', calculada una vez por columna y sentido.
+
+    Los valores vacíos quedan al final en ambos sentidos y los empates conservan el orden original.
+    """
+    serie = tablas()[1][columna]
+    if columna == 'Value':
+        claves = serie.to_numpy()
+    else:
+        # Rango alfabético de cada categoría, repartido a los registros a través de sus códigos
+        rangos = np.argsort(np.argsort(serie.cat.categories.to_numpy()))
+        claves = rangos[serie.cat.codes.to_numpy()].astype(float)
+    return np.argsort(-claves if descendente else claves, kind='stable')
+
+
+def generar_ndjson(datos, posiciones):
+    """Genera como NDJSON los registros de 'datos' en 'posiciones', en bloques, sin serializar todo a la vez."""
+    for inicio in range(0, len(posiciones), FILAS_POR_BLOQUE):
+        bloque = datos.iloc[posiciones[inicio:inicio + FILAS_POR_BLOQUE]].to_json(orient='records', lines=True)
+        yield bloque if bloque.endswith('\n') else bloque + '\n'
+
+
+def _entero(nombre, por_defecto=None):
+    valor = request.args.get(nombre)
+    return por_defecto if valor in (None, '') else int(valor)
 
 
 @app.route('/')
@@ -12,29 +171,80 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/datos')
+def obtener_datos():
+    """Datos filtrados, ordenados y paginados.
+
+    ?country=&indicator=&search=&year_from=&year_to=&sort=&order=asc|desc&limit=&cursor=&format=ndjson
+    """
+    try:
+        anio_desde = _entero('year_from')
+        anio_hasta = _entero('year_to')
+        inicio = _entero('cursor', 0)
+        limite = _entero('limit')
+    except ValueError:
+        return jsonify({'error': 'Los parámetros year_from, year_to, limit y cursor deben ser enteros.'}), 400
+    if inicio < 0 or (limite is not None and limite <= 0):
+        return jsonify({'error': 'cursor debe ser >= 0 y limit > 0.'}), 400
+    orden = request.args.get('sort') or None
+    if orden is not None and orden not in COLUMNAS_ORDENABLES:
+        return jsonify({'error': f"sort debe ser una de: {', '.join(COLUMNAS_ORDENABLES)}."}), 400
+
+    datos = tablas()[1]
+    posiciones = filtrar_datos(request.args.get('country'), request.args.get('indicator'), anio_desde, anio_hasta,
+                               request.args.get('search'), orden, request.args.get('order') == 'desc')
+
+    if request.args.get('format') == 'ndjson':
+        # Modo streaming: se envían los registros por bloques a medida que se serializan
+        fin = len(posiciones) if limite is None else inicio + limite
+        return Response(stream_with_context(generar_ndjson(datos, posiciones[inicio:fin])),
+                        mimetype='application/x-ndjson')
+
+    limite = min(limite or LIMITE_POR_DEFECTO, LIMITE_MAXIMO)
+    total = len(posiciones)
+    siguiente = inicio + limite if inicio + limite < total else None
+    cuerpo = '{"datos":%s,"total":%d,"siguiente":%s}' % (
+        a_json(datos.iloc[posiciones[inicio:inicio + limite]]), total, 'null' if siguiente is None else siguiente)
+    return Response(cuerpo, mimetype='application/json')
+
+
 @app.route('/todos_los_datos')
 def obtener_todos_los_datos():
-    # Obtener las columnas de los años y los valores
-    columnas_anios = df.columns[4:25]  # Columnas de los años desde E4 hasta BP4
-    columnas_valores = df.columns[24:]  # Columnas de los valores desde Y4 hasta el final
-
-    # Convertir los datos a un formato que sea más fácil de procesar en JavaScript
-    datos_formateados = []
-    for idx, fila in df.iterrows():
-        for anio, valor in zip(columnas_anios, fila[columnas_valores]):
-            # Convertir NaN a None
-            if pd.isna(valor):
-                valor = None
-            datos_formateados.append({
-                'Country Name': idx[0],
-                'Country Code': idx[1],
-                'Indicator Name': idx[2],
-                'Indicator Code': idx[3],
-                'Year': anio,
-                'Value': valor
-            })
-
-    return jsonify(datos_formateados)
+    return respuesta_cacheable('todos_los_datos', lambda: a_json(tablas()[1]))
+
+
+@app.route('/series/<pais>')
+def obtener_series(pais):
+    """Serie temporal de todos los indicadores de un país (por código o nombre)."""
+    cuerpo = obtener_agregados()['series'].get(pais)
+    if cuerpo is None:
+        return jsonify({'error': f"No se encontró el país '{pais}'."}), 404
+    return respuesta_cacheable(f"series:{pais}", lambda: cuerpo)
+
+
+@app.route('/estadisticas')
+def obtener_estadisticas():
+    """Media, mediana, mínimo, máximo, percentiles y cobertura entre países por año: ?indicator="""
+    calculados = obtener_agregados()
+    indicador = _indicador(calculados)
+    cuerpo = calculados['estadisticas'].get(indicador)
+    if cuerpo is None:
+        return jsonify({'error': 'Indicador no encontrado.'}), 404
+    return respuesta_cacheable(f"estadisticas:{indicador}", lambda: cuerpo)
+
+
+@app.route('/regiones')
+def obtener_regiones():
+    """Estadísticas por región o grupo de ingresos y año: ?indicator=&group=region|income"""
+    calculados = obtener_agregados()
+    agrupacion = request.args.get('group', 'region')
+    if agrupacion not in calculados['grupos']:
+        return jsonify({'error': 'group debe ser region o income.'}), 400
+    indicador = _indicador(calculados)
+    cuerpo = calculados['grupos'][agrupacion].get(indicador)
+    if cuerpo is None:
+        return jsonify({'error': 'Indicador no encontrado.'}), 404
+    return respuesta_cacheable(f"regiones:{agrupacion}:{indicador}", lambda: cuerpo)
 
 
 if __name__ == '__main__':
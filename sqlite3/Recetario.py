@@ -1,17 +1,75 @@
 import sqlite3 as sql
 import hashlib
+import threading
+
+# Milisegundos que una conexión espera a que se libere un bloqueo antes de fallar
+BUSY_TIMEOUT_MS = 5000
+# Caché de páginas por conexión (negativo = KiB) y tamaño máximo del archivo mapeado en memoria
+CACHE_SIZE_KIB = 20000
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def configure_connection(conn):
+    """Ajusta una conexión para acceso concurrente: WAL, synchronous=NORMAL, busy timeout y cachés."""
+    cursor = conn.cursor()
+    # Con WAL los lectores no se bloquean mientras hay un escritor, y viceversa
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # En modo WAL, NORMAL solo sincroniza en los checkpoints y sigue siendo seguro ante caídas
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    return conn
 
 
 def create_connection(database):
     """Crea una conexión a la base de datos SQLite."""
     try:
-        conn = sql.connect(database)
-        return conn
+        conn = sql.connect(database, timeout=BUSY_TIMEOUT_MS / 1000)
+        return configure_connection(conn)
     except sql.Error as e:
         print(f"Error al conectar a la base de datos: {e}")
         return None
 
 
+class ConnectionPool:
+    """Reparte una conexión configurada por hilo y la reutiliza en cada llamada desde ese hilo."""
+
+    def __init__(self, database):
+        self.database = database
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def connection(self):
+        """Devuelve la conexión del hilo actual, creándola la primera vez."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                # Cada conexión la usa un solo hilo; check_same_thread=False permite cerrarlas desde close_all
+                conn = configure_connection(
+                    sql.connect(self.database, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False))
+            except sql.Error as e:
+                print(f"Error al conectar a la base de datos: {e}")
+                return None
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        """Cierra todas las conexiones abiertas por el pool."""
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sql.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+
 def create_tables(conn):
     """Crea las tablas 'usuarios' y 'recetas' si no existen."""
     try:
@@ -32,11 +90,44 @@ def create_tables(conn):
                 id_usuario INTEGER,
                 FOREIGN KEY(id_usuario) REFERENCES usuarios(id)
             )""")
+        create_ingredient_index(conn)
         conn.commit()
     except sql.Error as e:
         print(f"Error al crear tablas: {e}")
 
 
+def create_ingredient_index(conn):
+    """Crea el índice de texto completo de ingredientes y los triggers que lo sincronizan con 'recetas'."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recetas_fts' ''')
+    existe = cursor.fetchone() is not None
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS recetas_fts USING fts5(
+            ingredientes,
+            content='recetas',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""")
+    # Los triggers mantienen el índice al día en add_recipe, update_recipe y delete_recipe
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS recetas_ai AFTER INSERT ON recetas BEGIN
+            INSERT INTO recetas_fts(rowid, ingredientes) VALUES (new.id, new.ingredientes);
+        END""")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS recetas_ad AFTER DELETE ON recetas BEGIN
+            INSERT INTO recetas_fts(recetas_fts, rowid, ingredientes) VALUES ('delete', old.id, old.ingredientes);
+        END""")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS recetas_au AFTER UPDATE OF ingredientes ON recetas BEGIN
+            INSERT INTO recetas_fts(recetas_fts, rowid, ingredientes) VALUES ('delete', old.id, old.ingredientes);
+            INSERT INTO recetas_fts(rowid, ingredientes) VALUES (new.id, new.ingredientes);
+        END""")
+    if not existe:
+        # Base de datos anterior al índice: se indexan las recetas ya guardadas
+        cursor.execute("INSERT INTO recetas_fts(recetas_fts) VALUES ('rebuild')")
+
+
 def hash_password(password):
     """Hashea una contraseña utilizando el algoritmo SHA-256."""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -180,22 +271,48 @@ def view_recipe_details(conn, id_receta):
         print(f"Error al ver detalles de receta: {e}")
 
 
-def search_recipe_by_ingredient(conn, ingrediente):
-    """Busca recetas que contengan un ingrediente específico."""
+def build_ingredient_query(ingredientes, modo="AND"):
+    """Construye una consulta FTS5 que busca cada ingrediente como frase completa."""
+    frases = []
+    for ingrediente in ingredientes:
+        ingrediente = ingrediente.strip()
+        if ingrediente:
+            frases.append('"' + ingrediente.replace('"', '""') + '"')
+    operador = " OR " if modo.upper() == "OR" else " AND "
+    return operador.join(frases)
+
+
+def search_recipe_by_ingredient(conn, ingrediente, modo="AND"):
+    """Busca recetas que contengan todos (AND) o alguno (OR) de los ingredientes, por relevancia."""
     try:
+        if isinstance(ingrediente, str):
+            ingredientes = ingrediente.split(',')
+        else:
+            ingredientes = list(ingrediente)
+        consulta = build_ingredient_query(ingredientes, modo)
+        if not consulta:
+            print("Debe indicar al menos un ingrediente.")
+            return []
+        descripcion = ', '.join(i.strip() for i in ingredientes if i.strip())
+
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id, receta FROM recetas WHERE ingredientes LIKE ?''', ('%' + ingrediente + '%',))
+            SELECT r.id, r.receta FROM recetas_fts
+            JOIN recetas r ON r.id = recetas_fts.rowid
+            WHERE recetas_fts MATCH ?
+            ORDER BY recetas_fts.rank''', (consulta,))
         recetas = cursor.fetchall()
 
         if recetas:
-            print(f"Recetas que contienen '{ingrediente}':")
+            print(f"Recetas que contienen '{descripcion}':")
             for receta in recetas:
                 print(f"ID: {receta[0]}\nReceta: {receta[1]}")
         else:
-            print(f"No se encontraron recetas que contengan '{ingrediente}'.")
+            print(f"No se encontraron recetas que contengan '{descripcion}'.")
+        return recetas
     except sql.Error as e:
         print(f"Error al buscar receta por ingrediente: {e}")
+        return []
 
 
 def main():
@@ -282,8 +399,9 @@ def main():
                                 print("Opción inválida.")
 
                     elif opcion_usuario == "5":
-                        ingrediente = input("Ingrese un ingrediente para buscar recetas: ")
-                        search_recipe_by_ingredient(conn, ingrediente)
+                        ingrediente = input("Ingrese uno o más ingredientes para buscar recetas (separados por coma): ")
+                        modo = input("¿Deben aparecer todos (T) o cualquiera (C)? [T]: ")
+                        search_recipe_by_ingredient(conn, ingrediente, "OR" if modo.strip().upper() == "C" else "AND")
 
                     elif opcion_usuario == "6":
                         print("Saliendo...")
@@ -0,0 +1,100 @@
+import os
+import sqlite3 as sql
+import sys
+import tempfile
+import threading
+import time
+
+from Recetario import ConnectionPool, create_tables
+
+# Compara N hilos lectores y un escritor sobre la misma base de datos:
+#  - antes: una conexión por hilo con la configuración por defecto (journal de rollback)
+#  - después: ConnectionPool (WAL, synchronous=NORMAL, busy timeout, cache_size y mmap_size)
+# Uso: python benchmark_concurrencia.py [lectores] [segundos]
+
+RECETAS_INICIALES = 20000
+
+
+def preparar_base(ruta):
+    conn = sql.connect(ruta)
+    create_tables(conn)
+    conn.execute("INSERT INTO usuarios (usuario, contrasena, email) VALUES ('bench', 'x', 'bench@example.com')")
+    conn.executemany(
+        "INSERT INTO recetas (receta, ingredientes, pasos, id_usuario) VALUES (?, ?, ?, 1)",
+        ((f"receta {i}", "harina\nhuevo\nleche", "mezclar\nhornear") for i in range(RECETAS_INICIALES)))
+    conn.commit()
+    conn.close()
+
+
+def lector(obtener_conexion, fin, resultados, indice):
+    conn = obtener_conexion()
+    lecturas = errores = 0
+    i = indice
+    while time.perf_counter() < fin:
+        try:
+            i = (i * 7919 + 1) % RECETAS_INICIALES
+            conn.execute("SELECT receta, ingredientes, pasos FROM recetas WHERE id = ?", (i + 1,)).fetchone()
+            conn.execute("SELECT id, receta FROM recetas WHERE id_usuario = ? LIMIT 50", (1,)).fetchall()
+            lecturas += 1
+        except sql.OperationalError:
+            errores += 1
+    resultados[indice] = (lecturas, errores)
+
+
+def escritor(obtener_conexion, fin, resultados):
+    conn = obtener_conexion()
+    escrituras = errores = 0
+    while time.perf_counter() < fin:
+        try:
+            conn.execute("INSERT INTO recetas (receta, ingredientes, pasos, id_usuario) VALUES (?, ?, ?, 1)",
+                         (f"nueva {time.perf_counter_ns()}", "arroz\npollo", "cocinar"))
+            conn.commit()  # Igual que add_recipe: un commit por receta
+            escrituras += 1
+        except sql.OperationalError:
+            conn.rollback()
+            errores += 1
+    resultados['escritor'] = (escrituras, errores)
+
+
+def ejecutar(nombre, obtener_conexion, lectores, segundos):
+    resultados = {}
+    fin = time.perf_counter() + segundos
+    hilos = [threading.Thread(target=lector, args=(obtener_conexion, fin, resultados, i)) for i in range(lectores)]
+    hilos.append(threading.Thread(target=escritor, args=(obtener_conexion, fin, resultados)))
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    escrituras, errores_escritura = resultados.pop('escritor')
+    lecturas = sum(r[0] for r in resultados.values())
+    errores_lectura = sum(r[1] for r in resultados.values())
+    print(f"{nombre:<8}{lecturas / segundos:>14.0f}{escrituras / segundos:>16.0f}"
+          f"{errores_lectura:>16}{errores_escritura:>18}")
+
+
+def main():
+    lectores = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    segundos = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{lectores} lectores + 1 escritor durante {segundos:g} s")
+    print(f"{'Modo':<8}{'lecturas/s':>14}{'escrituras/s':>16}{'errores lect.':>16}{'errores escr.':>18}")
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "antes.db")
+        preparar_base(ruta)
+        locales = threading.local()
+
+        def conexion_por_defecto():
+            if not hasattr(locales, "conn"):
+                locales.conn = sql.connect(ruta)
+            return locales.conn
+
+        ejecutar("antes", conexion_por_defecto, lectores, segundos)
+
+        ruta = os.path.join(directorio, "despues.db")
+        preparar_base(ruta)
+        pool = ConnectionPool(ruta)
+        ejecutar("después", pool.connection, lectores, segundos)
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
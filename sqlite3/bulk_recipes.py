@@ -0,0 +1,171 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3 as sql
+import time
+from itertools import islice
+
+from Recetario import create_connection, create_ingredient_index, create_tables
+
+# Importación y exportación masiva de recetas en JSONL o CSV.
+# JSONL: un objeto por línea con "receta", "ingredientes" y "pasos" (listas o texto) y, opcionalmente, "id_usuario".
+# CSV: columnas receta, ingredientes, pasos, id_usuario; ingredientes y pasos van separados por saltos de línea,
+# igual que se guardan en la base de datos.
+# Uso: python bulk_recipes.py import recetas.jsonl [--user ID]
+#      python bulk_recipes.py export recetas.csv [--user ID]
+
+BATCH_SIZE = 10000
+CSV_FIELDS = ["receta", "ingredientes", "pasos", "id_usuario"]
+
+INSERT_RECIPE = '''
+    INSERT OR IGNORE INTO recetas (receta, ingredientes, pasos, id_usuario) VALUES (?, ?, ?, ?)'''
+
+
+def _file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".csv":
+        return "csv"
+    raise ValueError(f"Formato no soportado: '{extension}' (use .jsonl, .ndjson o .csv)")
+
+
+def _as_text(value):
+    """Une las listas con saltos de línea, como add_recipe."""
+    if isinstance(value, list):
+        return '\n'.join(value)
+    return value
+
+
+def read_recipes(file, file_format):
+    """Devuelve un iterador con las recetas de un archivo abierto, sin cargarlo completo en memoria.
+
+    La cabecera del CSV se lee y se valida en el momento; el resto de las filas, a medida que se recorren.
+    """
+    if file_format == "jsonl":
+        return (json.loads(line) for line in file if line.strip())
+    reader = csv.DictReader(file)
+    if not reader.fieldnames or "receta" not in reader.fieldnames:
+        raise ValueError(f"El CSV no tiene la columna 'receta' (columnas: {', '.join(CSV_FIELDS)})")
+    return reader
+
+
+def import_recipes(conn, path, id_usuario=None, batch_size=BATCH_SIZE):
+    """Importa las recetas de un archivo con executemany en lotes de 'batch_size', en una sola transacción.
+
+    'id_usuario' se usa para las recetas que no traen uno propio. Las recetas con un nombre ya
+    existente se omiten. Si algo falla no se importa nada. Devuelve (insertadas, omitidas).
+    """
+    inserted = skipped = 0
+    start = time.perf_counter()
+    try:
+        # El archivo se abre y se valida (formato y cabecera del CSV) antes de empezar la transacción
+        file_format = _file_format(path)
+        file = open(path, newline='', encoding='utf-8')
+    except (OSError, ValueError) as e:
+        print(f"Error al importar recetas: {e}")
+        return inserted, skipped
+    with file:
+        try:
+            rows = (
+                (recipe["receta"], _as_text(recipe.get("ingredientes")), _as_text(recipe.get("pasos")),
+                 recipe.get("id_usuario") or id_usuario)
+                for recipe in read_recipes(file, file_format)
+            )
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            last_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM recetas").fetchone()[0]
+            # Indexar los ingredientes fila por fila con el trigger es lo más lento de la carga: se quita
+            # dentro de la transacción (otras conexiones nunca lo ven ausente) y se indexa todo al final
+            cursor.execute("DROP TRIGGER IF EXISTS recetas_ai")
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                cursor.executemany(INSERT_RECIPE, batch)
+                # rowcount suma las filas insertadas por executemany
+                inserted += cursor.rowcount
+                skipped += len(batch) - cursor.rowcount
+                elapsed = time.perf_counter() - start
+                print(f"{inserted + skipped} recetas procesadas ({(inserted + skipped) / elapsed:.0f} recetas/s)")
+            cursor.execute('''
+                INSERT INTO recetas_fts(rowid, ingredientes) SELECT id, ingredientes FROM recetas WHERE id > ?''',
+                           (last_id,))
+            create_ingredient_index(conn)
+            conn.commit()
+        except (sql.Error, OSError, csv.Error, KeyError, ValueError) as e:
+            # Sin transacción abierta (p. ej. falló la cabecera del CSV) rollback no hace nada
+            conn.rollback()
+            inserted = skipped = 0
+            print(f"Error al importar recetas: {e}")
+    elapsed = time.perf_counter() - start
+    print(f"¡Importación terminada! {inserted} insertadas, {skipped} omitidas en {elapsed:.2f} s "
+          f"({inserted / elapsed if elapsed else 0:.0f} recetas/s)")
+    return inserted, skipped
+
+
+def export_recipes(conn, path, id_usuario=None, batch_size=BATCH_SIZE):
+    """Exporta las recetas (de un usuario o todas) leyendo el cursor por bloques con fetchmany."""
+    exported = 0
+    start = time.perf_counter()
+    try:
+        cursor = conn.cursor()
+        query = "SELECT receta, ingredientes, pasos, id_usuario FROM recetas"
+        params = ()
+        if id_usuario is not None:
+            query += " WHERE id_usuario = ?"
+            params = (id_usuario,)
+        cursor.execute(query + " ORDER BY id", params)
+        file_format = _file_format(path)
+        with open(path, "w", newline='', encoding='utf-8') as file:
+            writer = csv.writer(file) if file_format == "csv" else None
+            if writer:
+                writer.writerow(CSV_FIELDS)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if writer:
+                    writer.writerows(rows)
+                else:
+                    file.writelines(
+                        json.dumps({
+                            "receta": receta,
+                            "ingredientes": ingredientes.split('\n') if ingredientes is not None else [],
+                            "pasos": pasos.split('\n') if pasos is not None else [],
+                            "id_usuario": usuario,
+                        }, ensure_ascii=False) + '\n'
+                        for receta, ingredientes, pasos, usuario in rows)
+                exported += len(rows)
+    except (sql.Error, OSError, ValueError) as e:
+        print(f"Error al exportar recetas: {e}")
+    elapsed = time.perf_counter() - start
+    print(f"¡Exportación terminada! {exported} recetas en {elapsed:.2f} s "
+          f"({exported / elapsed if elapsed else 0:.0f} recetas/s)")
+    return exported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa o exporta recetas en JSONL o CSV.")
+    parser.add_argument("accion", choices=["import", "export"])
+    parser.add_argument("archivo")
+    parser.add_argument("--db", default="recetario.db")
+    parser.add_argument("--user", type=int, default=None, help="ID del usuario de las recetas")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="recetas por lote")
+    args = parser.parse_args()
+
+    conn = create_connection(args.db)
+    if conn is None:
+        print("Error: No se pudo establecer la conexión a la base de datos.")
+        return
+    create_tables(conn)
+    if args.accion == "import":
+        import_recipes(conn, args.archivo, args.user, args.batch)
+    else:
+        export_recipes(conn, args.archivo, args.user, args.batch)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()